@@ -0,0 +1,252 @@
+"""This module benchmarks the word counting of main.py on a synthetic corpus.
+
+It generates a reproducible directory of text files in a temporary folder and
+times the original word-by-word counting loop against each output mode of the
+words (none, batched, gzip and zstd when the zstandard package is installed),
+printing the time taken by each mode and its speedup over the original loop.
+It also compares the tokens per second of the text and byte-level tokenizers,
+and measures the latency of the typo-tolerant completion of main2.py on a large
+synthetic vocabulary.
+
+Created on: 18 Oct 2026
+
+"""
+
+# Importing argparse, os, random, tempfile and time for generating and timing the corpus
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# Importing the functions to be benchmarked
+import main
+import main2
+
+
+def generate_corpus(directory: str, files: int = 200, words_per_file: int = 20000, seed: int = 0) -> list:
+    """Generates a reproducible corpus of text files, with a mix of alphabetic
+    words, numbers and punctuated tokens.
+
+    Args:
+        directory (str): directory where the text files are created
+        files (int, optional): number of text files. Defaults to 200.
+        words_per_file (int, optional): number of tokens in each file. Defaults to 20000.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        list: list of text files with its absolute path
+    """
+    generator = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(generator.choice(letters) for _ in range(generator.randint(2, 10))) for _ in range(5000)]
+    vocabulary += ["12", "3.14", "don't", "end.", "e-mail"]
+    textfiles = []
+    for index in range(files):
+        file = os.path.join(directory, f"file{index}.txt")
+        tokens = generator.choices(vocabulary, k=words_per_file)
+        with open(file, "w") as f:
+            for start in range(0, len(tokens), 12):
+                f.write(" ".join(tokens[start:start + 12]) + "\n")
+        textfiles.append(file)
+    return textfiles
+
+
+def original_words_and_frequency_write(textfiles: list, output_file: str = "words.txt") -> dict:
+    """The original counting loop of main.py, which writes every word with a
+    separate call and counts it with a dictionary lookup. Kept as the baseline.
+
+    Args:
+        textfiles (list): list of text files with its absolute path
+        output_file (str, optional): name of the output file along with its path. Defaults to "words.txt".
+
+    Returns:
+        dict: frequency of the words present in the files
+    """
+    with open(output_file, "w") as words_file:
+        frequency: dict = {}
+        for file in textfiles:
+            with open(file, "r") as f:
+                try:
+                    filecontents = f.read()
+                    words = filecontents.split()
+                    for word in words:
+                        if word.isalpha():
+                            words_file.write(word + "\n")
+                            if word in frequency.keys():
+                                frequency[word] += 1
+                            else:
+                                frequency[word] = 1
+                        else:
+                            continue
+                except UnicodeDecodeError:
+                    pass
+        return frequency
+
+
+def benchmark_words_modes(textfiles: list, directory: str, repeat: int = 3) -> None:
+    """Times the original loop and every output mode of the words, and prints
+    the best time of each along with its speedup over the original loop.
+
+    Args:
+        textfiles (list): list of text files with its absolute path
+        directory (str): directory where the words files are written
+        repeat (int, optional): number of runs of each mode, the best one is kept. Defaults to 3.
+    """
+    modes = ["none", "batched", "gzip"]
+    if main.zstandard is not None:
+        modes.append("zstd")
+
+    def best_time(function, *args, **kwargs):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    baseline, expected = best_time(original_words_and_frequency_write, textfiles,
+                                   os.path.join(directory, "words-original.txt"))
+    print(f"{'mode':<10}{'seconds':>10}{'speedup':>10}")
+    print(f"{'original':<10}{baseline:>10.3f}{1:>10.2f}")
+    for mode in modes:
+        elapsed, frequency = best_time(main.get_words_and_frequency_write, textfiles,
+                                       os.path.join(directory, f"words-{mode}.txt"), words_mode=mode)
+        if dict(frequency) != expected:
+            raise AssertionError(f"The {mode} mode counted the words differently")
+        print(f"{mode:<10}{elapsed:>10.3f}{baseline / elapsed:>10.2f}")
+
+
+def benchmark_tokenizers(textfiles: list, directory: str, repeat: int = 3) -> None:
+    """Times the text tokenizer (whole file and streaming) and the byte-level tokenizer
+    (unicode and ascii semantics) without writing the words, and prints the tokens per second.
+
+    Args:
+        textfiles (list): list of text files with its absolute path
+        directory (str): directory where the words files would be written
+        repeat (int, optional): number of runs of each tokenizer, the best one is kept. Defaults to 3.
+    """
+    tokens = 0
+    for file in textfiles:
+        with open(file, "r") as f:
+            tokens += len(f.read().split())
+
+    tokenizers = {"text": {},
+                  "streaming": {"streaming": True},
+                  "bytes": {"tokenizer": "bytes"},
+                  "ascii": {"tokenizer": "bytes", "semantics": "ascii"}}
+    print(f"{'tokenizer':<10}{'seconds':>10}{'tokens/s':>14}")
+    for name, options in tokenizers.items():
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            main.get_words_and_frequency_write(textfiles, os.path.join(directory, "words.txt"), words_mode="none",
+                                               **options)
+            times.append(time.perf_counter() - start)
+        print(f"{name:<10}{min(times):>10.3f}{tokens / min(times):>14,.0f}")
+
+
+def generate_vocabulary(file: str, vocabulary: int = 1000000, seed: int = 0) -> list:
+    """Generates a reproducible histogram of distinct words with Zipf-like counts, in the
+    "word - count" format written by main.py.
+
+    Args:
+        file (str): name of the histogram file along with its path
+        vocabulary (int, optional): number of distinct words. Defaults to 1000000.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        list: the distinct words, in the order they are written
+    """
+    generator = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words: set = set()
+    while len(words) < vocabulary:
+        words.add("".join(generator.choices(letters, k=generator.randint(3, 12))))
+    words_list = sorted(words)
+    generator.shuffle(words_list)
+    with open(file, "w") as f:
+        for rank, word in enumerate(words_list, 1):
+            f.write(f"{word} - {max(1, vocabulary // rank)}\n")
+    return words_list
+
+
+def benchmark_fuzzy(directory: str, vocabulary: int = 1000000, queries: int = 200, seed: int = 0,
+                    max_nodes: int = 20000) -> None:
+    """Times the typo-tolerant completion of main2.py on prefixes of random words with a typo
+    injected, for edit distances 1 and 2, and prints the latency percentiles of the queries.
+
+    Each query is also answered without a budget, and the recall is the fraction of those exact
+    completions found within the budget; the queries whose budget ran out are counted too.
+
+    Args:
+        directory (str): directory where the histogram and its index are written
+        vocabulary (int, optional): number of distinct words. Defaults to 1000000.
+        queries (int, optional): number of queries for each edit distance. Defaults to 200.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+        max_nodes (int, optional): budget of each query, see main2.PrefixIndex.fuzzy_complete. Defaults to 20000.
+    """
+    generator = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    histogram_file = os.path.join(directory, "vocabulary.txt")
+    words = generate_vocabulary(histogram_file, vocabulary, seed)
+
+    start = time.perf_counter()
+    index = main2.PrefixIndex(histogram_file, os.path.join(directory, "vocabulary-index.bin"))
+    index.fuzzy_complete("a")
+    print(f"index built and loaded in {time.perf_counter() - start:.3f} seconds")
+
+    prefixes = []
+    for word in generator.sample(words, queries):
+        prefix = list(word[:generator.randint(3, len(word))])
+        position = generator.randrange(len(prefix))
+        prefix[position] = generator.choice(letters)
+        prefixes.append("".join(prefix))
+
+    print(f"{'distance':<10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'exact p50':>11}"
+          f"{'recall':>9}{'cut short':>11}")
+    for distance in (1, 2):
+        latencies = []
+        exact_latencies = []
+        found = expected = cut_short = 0
+        for prefix in prefixes:
+            start = time.perf_counter()
+            result = index.fuzzy_complete(prefix, max_distance=distance, max_nodes=max_nodes)
+            latencies.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            exact = index.fuzzy_complete(prefix, max_distance=distance, max_nodes=None)
+            exact_latencies.append((time.perf_counter() - start) * 1000)
+            found += len(set(result.completions) & set(exact.completions))
+            expected += len(exact.completions)
+            cut_short += not result.exhaustive
+        latencies.sort()
+        exact_latencies.sort()
+        p50, p90, p99 = (latencies[min(len(latencies) - 1, int(len(latencies) * point))] for point in (0.5, 0.9, 0.99))
+        recall = found / expected if expected else 1.0
+        print(f"{distance:<10}{p50:>10.2f}{p90:>10.2f}{p99:>10.2f}{latencies[-1]:>10.2f}"
+              f"{exact_latencies[len(exact_latencies) // 2]:>11.2f}{recall:>9.3f}{cut_short:>11}")
+
+
+# driver code
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the word counting of main.py")
+    parser.add_argument("--files", type=int, default=200, help="number of text files to generate")
+    parser.add_argument("--words", type=int, default=20000, help="number of tokens in each text file")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of each mode")
+    parser.add_argument("--fuzzy", type=int, default=0, metavar="N",
+                        help="benchmark the typo-tolerant completion on a vocabulary of N words instead")
+    parser.add_argument("--fuzzy-queries", type=int, default=200, help="number of queries of each edit distance")
+    parser.add_argument("--max-nodes", type=int, default=20000, help="budget of each typo-tolerant query")
+    arguments = parser.parse_args()
+
+    if arguments.fuzzy:
+        with tempfile.TemporaryDirectory() as vocabulary_directory:
+            benchmark_fuzzy(vocabulary_directory, arguments.fuzzy, arguments.fuzzy_queries,
+                            max_nodes=arguments.max_nodes)
+        raise SystemExit
+
+    with tempfile.TemporaryDirectory() as corpus:
+        text_files = generate_corpus(corpus, arguments.files, arguments.words)
+        benchmark_words_modes(text_files, corpus, arguments.repeat)
+        print()
+        benchmark_tokenizers(text_files, corpus, arguments.repeat)
@@ -26,6 +26,140 @@ Last Edited: 14 Apr 2023
 
 # Importing the os module to work with os dependent functionality
 import os
+# Importing argparse for the options of the command line
+import argparse
+# Importing collections for counting the words at C speed
+import collections
+# Importing concurrent.futures and fnmatch for discovering the text files
+import concurrent.futures
+import fnmatch
+# Importing gzip and io for the compressed output modes of the words
+import gzip
+import io
+# Importing codecs, locale and mmap for the streaming and byte-level tokenizers
+import codecs
+import locale
+import mmap
+# Importing functools, multiprocessing, shutil and tempfile for the parallel counting mode
+import functools
+import multiprocessing
+import shutil
+import tempfile
+# Importing hashlib and json for the persisted file manifest
+import hashlib
+import json
+# Importing array, struct and sys for the binary histogram format
+import array
+import struct
+import sys
+# Importing heapq and math for the approximate counting mode
+import heapq
+import math
+
+# zstandard is optional, it is only needed for the zstd output mode of the words
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _scan_directory(directory: str, depth: int, include: tuple, exclude: tuple, follow_symlinks: bool) -> tuple:
+    """Scans a single directory with os.scandir and splits its entries into the matching files
+    and the sub-directories to be scanned next. Unreadable directories are skipped like os.walk does.
+
+    Args:
+        directory (str): directory to be scanned
+        depth (int): depth of the directory below the home directory
+        include (tuple): glob patterns a file name has to match
+        exclude (tuple): glob patterns of the file and directory names to leave out
+        follow_symlinks (bool): descends into symbolic links to directories
+
+    Returns:
+        tuple: list of matching files and list of (path, depth, (device, inode)) of the sub-directories
+    """
+    files = []
+    folders = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if any(fnmatch.fnmatch(entry.name, pattern) for pattern in exclude):
+                    continue
+                try:
+                    isdir = entry.is_dir()
+                except OSError:
+                    isdir = False
+                if not isdir:
+                    if any(fnmatch.fnmatch(entry.name, pattern) for pattern in include):
+                        files.append(entry.path)
+                    continue
+                if entry.is_symlink() and not follow_symlinks:
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                folders.append((entry.path, depth + 1, (stat.st_dev, stat.st_ino)))
+    except OSError:
+        pass
+    return files, folders
+
+
+def scan_files(directory: str, include: tuple = ("*.txt",), exclude: tuple = (), max_depth: int = None,
+               follow_symlinks: bool = False, workers: int = 1):
+    """Generates the files present in the home directory and its sub-directories with os.scandir,
+    yielding each file as soon as its directory is scanned so that the processing of the files
+    overlaps with the rest of the walk.
+
+    With one worker the files come in the same order as with os.walk. With more workers the
+    sub-directories are scanned in parallel by a thread pool and the order is not deterministic.
+    Directories reached again through symbolic links are scanned only once.
+
+    Args:
+        directory (str): home directory which is got from the user
+        include (tuple, optional): glob patterns a file name has to match. Defaults to ("*.txt",).
+        exclude (tuple, optional): glob patterns of the file and directory names to leave out. Defaults to ().
+        max_depth (int, optional): deepest level of sub-directories to descend into, 0 for only
+                                   the home directory. Defaults to None (no limit).
+        follow_symlinks (bool, optional): descends into symbolic links to directories. Defaults to False.
+        workers (int, optional): number of threads scanning directories in parallel. Defaults to 1.
+
+    Yields:
+        str: file with its absolute path
+    """
+    visited = set()
+    try:
+        stat = os.stat(directory)
+        visited.add((stat.st_dev, stat.st_ino))
+    except OSError:
+        return
+
+    def descend(folders):
+        for path, depth, key in folders:
+            if (max_depth is None or depth <= max_depth) and key not in visited:
+                visited.add(key)
+                yield path, depth
+
+    if workers <= 1:
+        stack = [iter([(directory, 0)])]
+        while stack:
+            folder = next(stack[-1], None)
+            if folder is None:
+                stack.pop()
+                continue
+            files, folders = _scan_directory(folder[0], folder[1], include, exclude, follow_symlinks)
+            yield from files
+            stack.append(descend(folders))
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        pending = {executor.submit(_scan_directory, directory, 0, include, exclude, follow_symlinks)}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                files, folders = future.result()
+                for path, depth in descend(folders):
+                    pending.add(executor.submit(_scan_directory, path, depth, include, exclude, follow_symlinks))
+                yield from files
 
 
 def get_text_files(directory: str) -> list:
@@ -38,69 +172,1141 @@ def get_text_files(directory: str) -> list:
     Returns:
         list: list of text files with its absolute path
     """
-    textfiles = []
-    for root, folders, files in os.walk(directory):
-        for file in files:  
-            if file.endswith(".txt"):
-                textfiles.append(os.path.join(root, file))
-    return textfiles
+    return list(scan_files(directory))
+
+
+def read_text_chunks(file: str, chunk_size: int = 1 << 20, use_mmap: bool = False):
+    """Reads the text file in chunks of at most chunk_size characters, either with
+    buffered reads or by decoding a memory map of the file incrementally.
+
+    Args:
+        file (str): text file with its absolute path
+        chunk_size (int, optional): size of each chunk. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps the file instead of reading it. Defaults to False.
+
+    Yields:
+        str: decoded contents of the file, chunk by chunk
+    """
+    if not use_mmap:
+        with open(file, "r") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        return
+
+    with open(file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+            for start in range(0, len(mapped), chunk_size):
+                chunk = decoder.decode(mapped[start:start + chunk_size])
+                if chunk:
+                    yield chunk
+            chunk = decoder.decode(b"", final=True)
+            if chunk:
+                yield chunk
+
+
+def iter_word_batches(file: str, chunk_size: int = 1 << 20, use_mmap: bool = False):
+    """Generates the alphabetic words of the text file in batches, one batch per chunk read,
+    so the memory used depends on chunk_size and not on the size of the file.
+    Words which cross the boundary of two chunks are stitched back together.
+
+    Args:
+        file (str): text file with its absolute path
+        chunk_size (int, optional): size of each chunk. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps the file instead of reading it. Defaults to False.
+
+    Yields:
+        list: alphabetic words of a chunk in the order they appear in the file
+    """
+    carry = ""
+    for chunk in read_text_chunks(file, chunk_size, use_mmap):
+        chunk = carry + chunk
+        words = chunk.split()
+        if words and not chunk[-1].isspace():
+            carry = words.pop()
+            # a long token which is already not alphabetic never becomes one,
+            # so only a non-alphabetic placeholder of it is kept
+            if len(carry) > chunk_size and not carry.isalpha():
+                carry = "0"
+        else:
+            carry = ""
+        yield list(filter(str.isalpha, words))
+    if carry.isalpha():
+        yield [carry]
+
+
+def iter_words(file: str, chunk_size: int = 1 << 20, use_mmap: bool = False):
+    """Generates the alphabetic words of the text file while reading it chunk by chunk,
+    using iter_word_batches.
+
+    Args:
+        file (str): text file with its absolute path
+        chunk_size (int, optional): size of each chunk. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps the file instead of reading it. Defaults to False.
+
+    Yields:
+        str: alphabetic words in the order they appear in the file
+    """
+    for words in iter_word_batches(file, chunk_size, use_mmap):
+        yield from words
+
+
+# the ASCII characters str.split() treats as whitespace, bytes.split() misses \x1c-\x1f
+_WHITESPACE = b"\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f "
+_WHITESPACE_TABLE = bytes.maketrans(b"\x1c\x1d\x1e\x1f", b"    ")
+
+
+def read_byte_chunks(file: str, chunk_size: int = 1 << 20, use_mmap: bool = False):
+    """Reads the raw bytes of the file in chunks which end on a whitespace byte, so that no
+    token is split between two chunks. A token longer than a chunk is carried over.
+
+    Args:
+        file (str): text file with its absolute path
+        chunk_size (int, optional): number of bytes read at a time. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps the file instead of reading it. Defaults to False.
+
+    Yields:
+        bytes: contents of the file, chunk by chunk
+    """
+    with open(file, "rb") as f:
+        if use_mmap and os.fstat(f.fileno()).st_size > 0:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            blocks = (mapped[start:start + chunk_size] for start in range(0, len(mapped), chunk_size))
+        else:
+            mapped = None
+            blocks = iter(functools.partial(f.read, chunk_size), b"")
+        try:
+            carry = b""
+            for block in blocks:
+                block = carry + block
+                cut = -1
+                for whitespace in _WHITESPACE:
+                    cut = max(cut, block.rfind(whitespace, cut + 1))
+                carry = block[cut + 1:]
+                # a long ASCII token which is already not a word never becomes one,
+                # so only a placeholder of it is kept
+                if len(carry) > chunk_size and carry.isascii() and not carry.isalpha():
+                    carry = b"0"
+                if cut >= 0:
+                    yield block[:cut + 1]
+            if carry:
+                yield carry
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+
+def _decode_token(token: bytes, encoding: str, errors: str) -> tuple:
+    """Decodes a token holding non-ASCII bytes and splits it into its alphabetic words,
+    according to the decoding policy for a token which cannot be decoded: "skip" drops it,
+    "replace" puts U+FFFD in place of the bad bytes and keeps the words which are alphabetic
+    apart from them, and "latin-1" decodes the token as latin-1 instead.
+
+    Args:
+        token (bytes): token to be decoded
+        encoding (str): encoding of the file
+        errors (str): decoding policy, "skip", "replace" or "latin-1"
+
+    Returns:
+        tuple: alphabetic words of the token, and whether it could not be decoded
+    """
+    try:
+        return tuple(filter(str.isalpha, token.decode(encoding).split())), False
+    except UnicodeDecodeError:
+        if errors == "skip":
+            return (), True
+        elif errors == "replace":
+            # U+FFFD is not a letter, so it is left out of the check, or a word with
+            # a bad byte would always be dropped and the policy would be the same as skip
+            return tuple(word for word in token.decode(encoding, "replace").split()
+                         if word.replace("\ufffd", "").isalpha()), True
+        elif errors == "latin-1":
+            return tuple(filter(str.isalpha, token.decode("latin-1").split())), True
+        raise ValueError(f"Unknown decoding policy: {errors}")
+
+
+def iter_byte_word_batches(file: str, chunk_size: int = 1 << 20, use_mmap: bool = False,
+                           semantics: str = "unicode", errors: str = "replace", encoding: str = "utf-8",
+                           undecodable: collections.Counter = None):
+    """Tokenizes the raw bytes of the text file chunk by chunk. A chunk which is all ASCII is
+    split right away, and in any other chunk only the distinct tokens which are kept are decoded.
+
+    With the "unicode" semantics the words are exactly the ones str.split() and str.isalpha()
+    give on the decoded text: tokens of ASCII letters are kept as they are, and tokens holding
+    non-ASCII bytes are decoded, split on Unicode whitespace and checked with isalpha. With the
+    "ascii" semantics only tokens of ASCII letters are kept. Bad byte sequences only affect the
+    tokens they occur in, according to the errors policy, instead of the whole file, and the
+    number of such tokens is counted into undecodable under the name of the file.
+    The encoding has to be ASCII compatible (UTF-8, latin-1, the Windows code pages...).
+
+    Args:
+        file (str): text file with its absolute path
+        chunk_size (int, optional): number of bytes read at a time. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps the file instead of reading it. Defaults to False.
+        semantics (str, optional): "unicode" or "ascii". Defaults to "unicode".
+        errors (str, optional): decoding policy, "skip", "replace" or "latin-1". Defaults to "replace".
+        encoding (str, optional): encoding of the file. Defaults to "utf-8".
+        undecodable (collections.Counter, optional): number of tokens which could not be decoded
+                                                     in each file, updated in place. Defaults to None.
+
+    Yields:
+        list: alphabetic words of a chunk in the order they appear in the file
+    """
+    if semantics not in ("unicode", "ascii"):
+        raise ValueError(f"Unknown tokenizer semantics: {semantics}")
+    for chunk in read_byte_chunks(file, chunk_size, use_mmap):
+        if chunk.isascii():
+            yield list(filter(str.isalpha, chunk.decode("ascii").split()))
+            continue
+        tokens = chunk.translate(_WHITESPACE_TABLE).split()
+        if semantics == "ascii":
+            yield b" ".join(filter(bytes.isalpha, tokens)).decode("ascii").split()
+            continue
+        decoded = {}
+        bad = set()
+        for token in dict.fromkeys(tokens):
+            if token.isalpha():
+                decoded[token] = (token.decode("ascii"),)
+            elif not token.isascii():
+                words, failed = _decode_token(token, encoding, errors)
+                if words:
+                    decoded[token] = words
+                if failed:
+                    bad.add(token)
+        if bad and undecodable is not None:
+            undecodable[file] += sum(token in bad for token in tokens)
+        yield [word for token in tokens if token in decoded for word in decoded[token]]
+
+
+def count_words_in_bytes(file: str, frequency: collections.Counter, words_file=None, chunk_size: int = 1 << 20,
+                         use_mmap: bool = False, semantics: str = "unicode", errors: str = "replace",
+                         encoding: str = "utf-8", undecodable: collections.Counter = None) -> None:
+    """Counts the alphabetic words of a single text file into the given frequency counter
+    with the byte-level tokenizer (see iter_byte_word_batches).
+
+    Args:
+        file (str): text file with its absolute path
+        frequency (collections.Counter): frequency of the words, updated in place
+        words_file (TextIOWrapper, optional): file handle to where the words are written. Defaults to None.
+        chunk_size (int, optional): number of bytes read at a time. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps the file instead of reading it. Defaults to False.
+        semantics (str, optional): "unicode" or "ascii". Defaults to "unicode".
+        errors (str, optional): decoding policy, "skip", "replace" or "latin-1". Defaults to "replace".
+        encoding (str, optional): encoding of the file. Defaults to "utf-8".
+        undecodable (collections.Counter, optional): number of tokens which could not be decoded
+                                                     in each file, updated in place. Defaults to None.
+    """
+    for words in iter_byte_word_batches(file, chunk_size, use_mmap, semantics, errors, encoding, undecodable):
+        frequency.update(words)
+        if words_file is not None:
+            _write_words(words_file, words)
+
 
+def _write_words(words_file, words: list) -> None:
+    """Writes a batch of words to the words file with a single write call, one word per line.
 
-def get_words_and_frequency_write(textfiles: list, output_file: str = "words.txt") -> dict:
+    Args:
+        words_file (TextIOWrapper): file handle to where the words are written
+        words (list): words to be written
+    """
+    if words:
+        words_file.write("\n".join(words))
+        words_file.write("\n")
+
+
+def count_words_in_file(file: str, frequency: collections.Counter, words_file=None, streaming: bool = False,
+                        chunk_size: int = 1 << 20, use_mmap: bool = False, tokenizer: str = "text",
+                        semantics: str = "unicode", errors: str = "replace",
+                        undecodable: collections.Counter = None) -> None:
+    """Counts the alphabetic words of a single text file into the given frequency counter.
+    With the "text" tokenizer, files that cannot be decoded are skipped as a whole. The "bytes"
+    tokenizer reads UTF-8 files chunk by chunk and handles bad bytes per token instead.
+
+    Args:
+        file (str): text file with its absolute path
+        frequency (collections.Counter): frequency of the words, updated in place
+        words_file (TextIOWrapper, optional): file handle to where the words are written. Defaults to None.
+        streaming (bool, optional): reads the file chunk by chunk with iter_word_batches. Defaults to False.
+        chunk_size (int, optional): size of each chunk in the streaming mode. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps the file in the streaming mode. Defaults to False.
+        tokenizer (str, optional): "text" or "bytes" (see count_words_in_bytes). Defaults to "text".
+        semantics (str, optional): "unicode" or "ascii" words for the "bytes" tokenizer. Defaults to "unicode".
+        errors (str, optional): decoding policy of the "bytes" tokenizer. Defaults to "replace".
+        undecodable (collections.Counter, optional): number of tokens the "bytes" tokenizer could not
+                                                     decode in each file, updated in place. Defaults to None.
+    """
+    if tokenizer == "bytes":
+        count_words_in_bytes(file, frequency, words_file, chunk_size, use_mmap, semantics, errors,
+                             undecodable=undecodable)
+        return
+    elif tokenizer != "text":
+        raise ValueError(f"Unknown tokenizer: {tokenizer}")
+
+    if streaming:
+        # the words are counted and spooled separately and only merged once the whole
+        # file is decoded, so that a decoding error still skips the file as a whole
+        filefrequency = collections.Counter()
+        with tempfile.SpooledTemporaryFile(max_size=4 * chunk_size, mode="w+") as spool:
+            try:
+                for words in iter_word_batches(file, chunk_size, use_mmap):
+                    filefrequency.update(words)
+                    if words_file is not None:
+                        _write_words(spool, words)
+            except UnicodeDecodeError:
+                return
+            frequency.update(filefrequency)
+            if words_file is not None:
+                spool.seek(0)
+                shutil.copyfileobj(spool, words_file)
+        return
+
+    with open(file, "r") as f:
+        try:
+            filecontents = f.read()
+        except UnicodeDecodeError:
+            return
+    words = list(filter(str.isalpha, filecontents.split()))
+    frequency.update(words)
+    if words_file is not None:
+        _write_words(words_file, words)
+
+
+def open_words_file(output_file: str, words_mode: str = "batched"):
+    """Opens the file to where the words are written, according to the output mode.
+
+    The modes are "none" (the words are not written at all), "batched" (a plain text
+    file, one word per line, written in one call per batch of words), "gzip" and "zstd"
+    (the same text compressed on the fly, zstd needs the zstandard package).
+
+    Args:
+        output_file (str): name of the output file along with its path
+        words_mode (str, optional): output mode of the words. Defaults to "batched".
+
+    Returns:
+        TextIOWrapper: file handle to where the words are written, None for the "none" mode
+    """
+    if words_mode == "none":
+        return None
+    elif words_mode == "batched":
+        return open(output_file, "w")
+    elif words_mode == "gzip":
+        return gzip.open(output_file, "wt", compresslevel=6)
+    elif words_mode == "zstd":
+        if zstandard is None:
+            raise RuntimeError("The zstd output mode requires the zstandard package")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(output_file, "wb")))
+    else:
+        raise ValueError(f"Unknown output mode for the words: {words_mode}")
+
+
+def get_words_and_frequency_write(textfiles: list, output_file: str = "words.txt", streaming: bool = False,
+                                  chunk_size: int = 1 << 20, use_mmap: bool = False,
+                                  words_mode: str = "batched", tokenizer: str = "text", semantics: str = "unicode",
+                                  errors: str = "replace", undecodable: collections.Counter = None) -> dict:
     """Gets the words and its corresponding frequency from the files passed to the function.
     Also writes the words to the output_file, which is also passed.
 
     Args:
         textfiles (list): list of text files with its absolute path
         output_file (str, optional): name of the output file along with its path. Defaults to "words.txt".
+        streaming (bool, optional): reads each file chunk by chunk instead of as a whole. Defaults to False.
+        chunk_size (int, optional): size of each chunk in the streaming mode. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps each file in the streaming mode. Defaults to False.
+        words_mode (str, optional): output mode of the words, see open_words_file. Defaults to "batched".
+        tokenizer (str, optional): "text" or "bytes" (see count_words_in_bytes). Defaults to "text".
+        semantics (str, optional): "unicode" or "ascii" words for the "bytes" tokenizer. Defaults to "unicode".
+        errors (str, optional): decoding policy of the "bytes" tokenizer. Defaults to "replace".
+        undecodable (collections.Counter, optional): number of tokens the "bytes" tokenizer could not
+                                                     decode in each file, updated in place. Defaults to None.
 
     Returns:
         dict: frequency of the words present in the files
     """
-    with open(output_file, "w") as words_file:
-        frequency: dict = {}
+    frequency = collections.Counter()
+    words_file = open_words_file(output_file, words_mode)
+    try:
         for file in textfiles:
-            with open(file, "r") as f:
-                try:
-                    filecontents = f.read()
-                    words = filecontents.split()
-                    for word in words:
-                        if word.isalpha():
-                            words_file.write(word + "\n")
-                            if word in frequency.keys():
-                                frequency[word] += 1
-                            else:
-                                frequency[word] = 1
-                        else:
-                            continue
-                except UnicodeDecodeError:
-                    pass
-        return frequency
-
-
-def write_word_histogram(frequency_of_words: dict, output_file: str = "words-histogram.txt") -> None:
+            count_words_in_file(file, frequency, words_file, streaming, chunk_size, use_mmap,
+                                tokenizer, semantics, errors, undecodable)
+    finally:
+        if words_file is not None:
+            words_file.close()
+    return frequency
+
+
+def chunk_text_files(textfiles: list, strategy: str = "file", chunk_bytes: int = 1 << 20):
+    """Groups the text files into the chunks handed to each worker in the parallel mode.
+
+    With the "file" strategy every file is a chunk of its own. With the "bytes" strategy
+    consecutive files are grouped until their combined size reaches chunk_bytes, so that
+    small files do not pay the inter-process overhead one by one.
+
+    Args:
+        textfiles (list): list of text files with its absolute path
+        strategy (str, optional): "file" or "bytes". Defaults to "file".
+        chunk_bytes (int, optional): byte budget of a chunk for the "bytes" strategy. Defaults to 1 MiB.
+
+    Yields:
+        list: consecutive text files making up one chunk
+    """
+    if strategy == "file":
+        for file in textfiles:
+            yield [file]
+    elif strategy == "bytes":
+        chunk = []
+        chunksize = 0
+        for file in textfiles:
+            try:
+                chunksize += os.path.getsize(file)
+            except OSError:
+                pass
+            chunk.append(file)
+            if chunksize >= chunk_bytes:
+                yield chunk
+                chunk = []
+                chunksize = 0
+        if chunk:
+            yield chunk
+    else:
+        raise ValueError(f"Unknown chunking strategy: {strategy}")
+
+
+def _count_chunk(task: tuple, **options) -> tuple:
+    """Worker of the parallel mode: counts the words of one chunk into a local frequency table.
+
+    Args:
+        task (tuple): chunk of text files and the part file for its words (or None)
+        **options: streaming and tokenizer options passed on to count_words_in_file
+
+    Returns:
+        tuple: frequency of the words present in the chunk, and number of undecodable tokens in each file
+    """
+    chunk, part_file = task
+    frequency = collections.Counter()
+    undecodable = collections.Counter()
+    if part_file is None:
+        for file in chunk:
+            count_words_in_file(file, frequency, undecodable=undecodable, **options)
+    else:
+        with open(part_file, "w") as words_file:
+            for file in chunk:
+                count_words_in_file(file, frequency, words_file, undecodable=undecodable, **options)
+    return frequency, undecodable
+
+
+def get_words_and_frequency_parallel(textfiles: list, output_file: str = "words.txt", workers: int = None,
+                                     strategy: str = "file", chunk_bytes: int = 1 << 20, streaming: bool = False,
+                                     chunk_size: int = 1 << 20, use_mmap: bool = False,
+                                     words_mode: str = "batched", tokenizer: str = "text",
+                                     semantics: str = "unicode", errors: str = "replace",
+                                     undecodable: collections.Counter = None) -> dict:
+    """Parallel version of get_words_and_frequency_write, which spreads the files across a process pool.
+
+    Each worker builds a local frequency table for its chunk and the tables are merged in
+    the order of the files, so the result (including the order of the words) is the same
+    as the one of the serial version. The words written by each worker are concatenated
+    into output_file in the same order.
+
+    Args:
+        textfiles (list): list of text files with its absolute path
+        output_file (str, optional): name of the output file along with its path, or None to
+                                     skip writing the words. Defaults to "words.txt".
+        workers (int, optional): number of worker processes. Defaults to the number of CPUs.
+        strategy (str, optional): chunking strategy, "file" or "bytes". Defaults to "file".
+        chunk_bytes (int, optional): byte budget of a chunk for the "bytes" strategy. Defaults to 1 MiB.
+        streaming (bool, optional): reads each file chunk by chunk instead of as a whole. Defaults to False.
+        chunk_size (int, optional): size of each chunk in the streaming mode. Defaults to 1 MiB.
+        use_mmap (bool, optional): memory-maps each file in the streaming mode. Defaults to False.
+        words_mode (str, optional): output mode of the words, see open_words_file. Defaults to "batched".
+        tokenizer (str, optional): "text" or "bytes" (see count_words_in_bytes). Defaults to "text".
+        semantics (str, optional): "unicode" or "ascii" words for the "bytes" tokenizer. Defaults to "unicode".
+        errors (str, optional): decoding policy of the "bytes" tokenizer. Defaults to "replace".
+        undecodable (collections.Counter, optional): number of tokens the "bytes" tokenizer could not
+                                                     decode in each file, updated in place. Defaults to None.
+
+    Returns:
+        dict: frequency of the words present in the files
+    """
+    count_chunk = functools.partial(_count_chunk, streaming=streaming, chunk_size=chunk_size, use_mmap=use_mmap,
+                                    tokenizer=tokenizer, semantics=semantics, errors=errors)
+    frequency = collections.Counter()
+    chunks = chunk_text_files(textfiles, strategy, chunk_bytes)
+    if words_mode == "none":
+        output_file = None
+    outputdir = os.path.dirname(os.path.abspath(output_file)) if output_file is not None else None
+    with tempfile.TemporaryDirectory(dir=outputdir) as partsdir:
+        if output_file is None:
+            tasks = ((chunk, None) for chunk in chunks)
+        else:
+            tasks = ((chunk, os.path.join(partsdir, f"{index}.part")) for index, chunk in enumerate(chunks))
+        numberofchunks = 0
+        with multiprocessing.Pool(workers) as pool:
+            # imap keeps the results in the order of the chunks, so merging them
+            # preserves the first occurrence order of the serial version
+            for local_frequency, local_undecodable in pool.imap(count_chunk, tasks):
+                numberofchunks += 1
+                frequency.update(local_frequency)
+                if undecodable is not None:
+                    undecodable.update(local_undecodable)
+        if output_file is not None:
+            with open_words_file(output_file, words_mode) as words_file:
+                for index in range(numberofchunks):
+                    with open(os.path.join(partsdir, f"{index}.part"), "r") as part:
+                        shutil.copyfileobj(part, words_file)
+    return frequency
+
+
+class CountMinSketch:
+    """Count-min sketch: approximate frequency of the words in a fixed table of depth rows
+    of width counters. An estimate never undercounts, and with probability 1 - e^-depth it
+    overcounts by at most e / width times the total number of words added.
+    """
+
+    def __init__(self, width: int = 1 << 18, depth: int = 4):
+        """
+        Args:
+            width (int, optional): number of counters in each row. Defaults to 2^18.
+            depth (int, optional): number of rows, each with its own hash function. Defaults to 4.
+        """
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = array.array("Q", bytes(8 * width * depth))
+
+    def _positions(self, word: str) -> list:
+        """Returns the position of the counter of the word in each row, derived from one
+        blake2b digest by double hashing."""
+        first, second = struct.unpack("<QQ", hashlib.blake2b(word.encode("utf-8", "surrogatepass"),
+                                                             digest_size=16).digest())
+        second |= 1
+        return [row * self.width + (first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, word: str, count: int = 1) -> int:
+        """Adds count occurrences of the word and returns its new estimate."""
+        self.total += count
+        table = self.table
+        estimate = None
+        for position in self._positions(word):
+            table[position] += count
+            if estimate is None or table[position] < estimate:
+                estimate = table[position]
+        return estimate
+
+    def estimate(self, word: str) -> int:
+        """Returns the estimated frequency of the word."""
+        return min(self.table[position] for position in self._positions(word))
+
+    def error_bound(self) -> float:
+        """Returns the bound of the overcount of any estimate, e / width times the total."""
+        return math.e / self.width * self.total
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: keeps at most capacity words with a count and the maximum
+    overcount of that count. Any word occurring more than total / capacity times is kept.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        """
+        Args:
+            capacity (int, optional): maximum number of words kept. Defaults to 1000.
+        """
+        self.capacity = capacity
+        self.counters: dict = {}
+        # min-heap of (count, word), with outdated entries skipped lazily
+        self.heap: list = []
+
+    def add(self, word: str, count: int = 1) -> None:
+        """Adds count occurrences of the word, replacing the word with the smallest count when full."""
+        counters = self.counters
+        if word in counters:
+            counters[word][0] += count
+        elif len(counters) < self.capacity:
+            counters[word] = [count, 0]
+        else:
+            while True:
+                smallest, evicted = heapq.heappop(self.heap)
+                if evicted in counters and counters[evicted][0] == smallest:
+                    break
+            del counters[evicted]
+            counters[word] = [smallest + count, smallest]
+        heapq.heappush(self.heap, (counters[word][0], word))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(counter[0], kept) for kept, counter in counters.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, k: int) -> list:
+        """Returns the k words with the largest counts as (word, count, overcount) tuples."""
+        largest = heapq.nlargest(k, self.counters.items(), key=lambda item: item[1][0])
+        return [(word, counter[0], counter[1]) for word, counter in largest]
+
+
+def get_words_and_frequency_approximate(textfiles: list, top_k: int = 100, width: int = 1 << 18, depth: int = 4,
+                                        capacity: int = None, chunk_size: int = 1 << 20) -> tuple:
+    """Gets the approximate frequency of the top_k most frequent words with a fixed memory budget,
+    set by the size of a count-min sketch (width x depth counters) and of a Space-Saving
+    structure (capacity words), whatever the size of the vocabulary.
+
+    The files are read chunk by chunk like in the streaming mode. The estimate of a word is the
+    smaller of its two counts, so it never undercounts, and its error bound is the distance from
+    the estimate to the lower bound given by Space-Saving. Unlike the exact modes, the chunks of
+    a file read before a decoding error are still counted.
+
+    Args:
+        textfiles (list): list of text files with its absolute path
+        top_k (int, optional): number of words reported. Defaults to 100.
+        width (int, optional): number of counters in each row of the sketch. Defaults to 2^18.
+        depth (int, optional): number of rows of the sketch. Defaults to 4.
+        capacity (int, optional): number of words kept by Space-Saving. Defaults to 10 times top_k.
+        chunk_size (int, optional): size of each chunk read. Defaults to 1 MiB.
+
+    Returns:
+        tuple: estimated frequency of the top words (dict, most frequent first, which can be passed to
+        write_word_histogram) and the maximum overcount of each of these estimates (dict)
+    """
+    sketch = CountMinSketch(width, depth)
+    heavyhitters = SpaceSaving(capacity if capacity is not None else 10 * top_k)
+    for file in textfiles:
+        try:
+            for words in iter_word_batches(file, chunk_size):
+                for word, count in collections.Counter(words).items():
+                    sketch.add(word, count)
+                    heavyhitters.add(word, count)
+        except UnicodeDecodeError:
+            continue
+
+    estimates = []
+    for word, count, overcount in heavyhitters.top(heavyhitters.capacity):
+        estimate = min(count, sketch.estimate(word))
+        estimates.append((word, estimate, estimate - (count - overcount)))
+    estimates.sort(key=lambda item: item[1], reverse=True)
+    frequency = {word: estimate for word, estimate, error in estimates[:top_k]}
+    errors = {word: error for word, estimate, error in estimates[:top_k]}
+    return frequency, errors
+
+
+def file_digest(file: str) -> str:
+    """Computes the SHA-256 hash of the contents of the file, reading it in blocks.
+
+    Args:
+        file (str): file with its absolute path
+
+    Returns:
+        str: hexadecimal digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(functools.partial(f.read, 1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_file: str) -> dict:
+    """Loads the manifest written by a previous run, or returns an empty one.
+
+    The manifest records the size, mtime, optional content hash and word counts of every
+    text file, along with the total frequency of the words over all the files.
+
+    Args:
+        manifest_file (str): name of the manifest file along with its path
+
+    Returns:
+        dict: manifest with the "files" and "totals" of the previous run
+    """
+    try:
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"version": 1, "files": {}, "totals": {}}
+    return manifest
+
+
+def save_manifest(manifest: dict, manifest_file: str) -> None:
+    """Writes the manifest to a temporary file and moves it into place, so an interrupted
+    run never leaves a truncated manifest behind.
+
+    Args:
+        manifest (dict): manifest with the "files" and "totals"
+        manifest_file (str): name of the manifest file along with its path
+    """
+    temporary_file = manifest_file + ".tmp"
+    with open(temporary_file, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temporary_file, manifest_file)
+
+
+def _apply_counts(totals: dict, counts: dict, sign: int) -> None:
+    """Adds (sign 1) or removes (sign -1) the word counts of a file from the totals.
+
+    Args:
+        totals (dict): frequency of the words over all the files, updated in place
+        counts (dict): frequency of the words of one file
+        sign (int): 1 to add the counts, -1 to remove them
+    """
+    for word, count in counts.items():
+        total = totals.get(word, 0) + sign * count
+        if total:
+            totals[word] = total
+        else:
+            del totals[word]
+
+
+def get_words_and_frequency_incremental(textfiles: list, manifest_file: str = "words-manifest.json",
+                                        use_hash: bool = False, streaming: bool = False,
+                                        chunk_size: int = 1 << 20) -> dict:
+    """Gets the frequency of the words like get_words_and_frequency_write, but only re-tokenizes
+    the files which were added, changed or deleted since the run that wrote the manifest.
+
+    A file is unchanged when its size and mtime match the manifest. With use_hash, a file whose
+    mtime changed but whose contents hash to the recorded value is not re-tokenized either.
+    The differences of the changed files are applied to the stored totals, and the manifest
+    is saved again for the next run. The words are not written to words.txt in this mode.
+
+    Args:
+        textfiles (list): list of text files with its absolute path
+        manifest_file (str, optional): name of the manifest file along with its path.
+                                       Defaults to "words-manifest.json".
+        use_hash (bool, optional): records and compares a content hash of each file. Defaults to False.
+        streaming (bool, optional): reads each changed file chunk by chunk. Defaults to False.
+        chunk_size (int, optional): size of each chunk in the streaming mode. Defaults to 1 MiB.
+
+    Returns:
+        dict: frequency of the words present in the files
+    """
+    manifest = load_manifest(manifest_file)
+    entries = manifest["files"]
+    totals = manifest["totals"]
+    seen = set()
+    for file in textfiles:
+        seen.add(file)
+        stat = os.stat(file)
+        entry = entries.get(file)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            continue
+        digest = file_digest(file) if use_hash else None
+        if entry is not None and digest is not None and entry.get("hash") == digest:
+            entry["mtime"] = stat.st_mtime_ns
+            continue
+
+        counts = collections.Counter()
+        count_words_in_file(file, counts, streaming=streaming, chunk_size=chunk_size)
+        if entry is not None:
+            _apply_counts(totals, entry["counts"], -1)
+        _apply_counts(totals, counts, 1)
+        entries[file] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": digest, "counts": counts}
+
+    for file in [file for file in entries if file not in seen]:
+        _apply_counts(totals, entries.pop(file)["counts"], -1)
+
+    save_manifest(manifest, manifest_file)
+    return totals
+
+
+def _order_histogram(entries, order: str = "insertion", top_n: int = None):
+    """Orders the (word, count) entries of a histogram for writing. The top_n most frequent
+    words are picked with a bounded heap and come most frequent first, unless the order is "alpha".
+
+    Args:
+        entries (iterable): (word, count) entries of the histogram
+        order (str, optional): "insertion", "count" (most frequent first, ties alphabetical) or "alpha".
+                               Defaults to "insertion".
+        top_n (int, optional): number of most frequent words to keep. Defaults to None (all the words).
+
+    Returns:
+        iterable: (word, count) entries in the order they are written
+    """
+    if order not in ("insertion", "count", "alpha"):
+        raise ValueError(f"Unknown histogram order: {order}")
+    if top_n is not None:
+        entries = heapq.nsmallest(top_n, entries, key=lambda entry: (-entry[1], entry[0]))
+        if order == "alpha":
+            entries.sort()
+        return entries
+    if order == "count":
+        return sorted(entries, key=lambda entry: (-entry[1], entry[0]))
+    if order == "alpha":
+        return sorted(entries)
+    return entries
+
+
+def write_word_histogram(frequency_of_words: dict, output_file: str = "words-histogram.txt",
+                         order: str = "insertion", top_n: int = None) -> None:
     """Writes the frequency of each word to the given output file.
 
     Args:
         frequency_of_words (dict): frequency of the words present in the files
         output_file (str, optional): name of the output file along with its path. Defaults to "words-histogram.txt".
+        order (str, optional): "insertion" (the order of the dictionary), "count" (most frequent first)
+                               or "alpha" (alphabetical). Defaults to "insertion".
+        top_n (int, optional): only writes the top_n most frequent words. Defaults to None (all the words).
     """
     with open(output_file, "w") as histogram_file:
-        for word, count in frequency_of_words.items():
+        for word, count in _order_histogram(frequency_of_words.items(), order, top_n):
             histogram_file.write(word + " - " + str(count) + "\n")
     histogram_file.close()
 
 
+def _write_run(entries, directory: str, runs: list, prefix: str = "run") -> None:
+    """Writes sorted (word, count) entries to a new run file in the directory, one
+    "word count" line each, and appends its name to the list of runs. The words never
+    contain whitespace, so the lines can be split unambiguously.
+
+    Args:
+        entries (iterable): sorted (word, count) entries
+        directory (str): directory of the run files
+        runs (list): names of the run files written so far, updated in place
+        prefix (str, optional): prefix of the names of the run files. Defaults to "run".
+    """
+    run_file = os.path.join(directory, f"{prefix}{len(runs)}.txt")
+    with open(run_file, "w", encoding="utf-8", newline="\n") as run:
+        for word, count in entries:
+            run.write(f"{word} {count}\n")
+    runs.append(run_file)
+
+
+def _read_run(run_file: str):
+    """Generates the (word, count) entries of a run file written by _write_run.
+
+    Args:
+        run_file (str): name of the run file along with its path
+
+    Yields:
+        tuple: word and its count
+    """
+    with open(run_file, "r", encoding="utf-8", newline="\n") as run:
+        for line in run:
+            word, count = line.split(" ")
+            yield word, int(count)
+
+
+def _merge_runs(run_files: list, key=None):
+    """Merges the sorted run files with a k-way merge, adding up the counts of a word
+    which appears in more than one run when they are sorted by word.
+
+    Args:
+        run_files (list): names of the run files along with their path
+        key (callable, optional): sort key of the runs, None when sorted by word. Defaults to None.
+
+    Yields:
+        tuple: word and its count, in the order of the runs
+    """
+    merged = heapq.merge(*(_read_run(run_file) for run_file in run_files), key=key)
+    if key is not None:
+        yield from merged
+        return
+    current, total = None, 0
+    for word, count in merged:
+        if word == current:
+            total += count
+            continue
+        if current is not None:
+            yield current, total
+        current, total = word, count
+    if current is not None:
+        yield current, total
+
+
+def write_word_histogram_external(textfiles: list, output_file: str = "words-histogram.txt", order: str = "alpha",
+                                  top_n: int = None, max_words: int = 1000000, temporary_dir: str = None,
+                                  chunk_size: int = 1 << 20, tokenizer: str = "text") -> None:
+    """Counts the words of the files and writes the histogram in alphabetical or count order
+    for vocabularies which do not fit in memory, keeping at most max_words words in memory.
+
+    Whenever the vocabulary being counted exceeds max_words, it is spilled to disk as a run
+    sorted by word. The runs are combined with a k-way merge into the alphabetical histogram.
+    The count order sorts the merged entries again in runs of max_words entries and merges them,
+    and top_n only keeps a bounded heap of the most frequent words. The files are read chunk by
+    chunk, so unlike the exact modes the chunks read before a decoding error are still counted
+    with the "text" tokenizer.
+
+    Args:
+        textfiles (list): list of text files with its absolute path
+        output_file (str, optional): name of the output file along with its path. Defaults to "words-histogram.txt".
+        order (str, optional): "alpha" or "count". Defaults to "alpha".
+        top_n (int, optional): only writes the top_n most frequent words. Defaults to None (all the words).
+        max_words (int, optional): number of words kept in memory before spilling. Defaults to 1000000.
+        temporary_dir (str, optional): directory for the run files. Defaults to the system temporary directory.
+        chunk_size (int, optional): size of each chunk read. Defaults to 1 MiB.
+        tokenizer (str, optional): "text" or "bytes" (see count_words_in_bytes). Defaults to "text".
+    """
+    if order not in ("alpha", "count"):
+        raise ValueError(f"Unknown histogram order: {order}")
+    with tempfile.TemporaryDirectory(dir=temporary_dir) as runsdir:
+        runs = []
+        frequency = collections.Counter()
+        for file in textfiles:
+            batches = iter_byte_word_batches(file, chunk_size) if tokenizer == "bytes" else \
+                iter_word_batches(file, chunk_size)
+            try:
+                for words in batches:
+                    frequency.update(words)
+                    if len(frequency) > max_words:
+                        _write_run(sorted(frequency.items()), runsdir, runs)
+                        frequency = collections.Counter()
+            except UnicodeDecodeError:
+                continue
+        if frequency:
+            _write_run(sorted(frequency.items()), runsdir, runs)
+        del frequency
+
+        entries = _merge_runs(runs)
+        if top_n is not None:
+            entries = _order_histogram(entries, order, top_n)
+        elif order == "count":
+            countruns = []
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) >= max_words:
+                    _write_run(sorted(batch, key=lambda item: (-item[1], item[0])), runsdir, countruns, "countrun")
+                    batch = []
+            if batch:
+                _write_run(sorted(batch, key=lambda item: (-item[1], item[0])), runsdir, countruns, "countrun")
+            del batch
+            entries = _merge_runs(countruns, key=lambda item: (-item[1], item[0]))
+
+        with open(output_file, "w") as histogram_file:
+            for word, count in entries:
+                histogram_file.write(word + " - " + str(count) + "\n")
+
+
+# header of the binary histogram: magic, version, reserved, number of words, size of the string table
+_BINARY_HEADER = struct.Struct("<4sHHQQ")
+_BINARY_MAGIC = b"WHST"
+_BINARY_VERSION = 1
+
+
+def write_binary_histogram(frequency_of_words: dict, output_file: str = "words-histogram.bin") -> None:
+    """Writes the frequency of each word to the given output file in a compact binary format,
+    which can be memory-mapped and searched without loading it (see lookup_word_count).
+
+    The file has a header, followed by the offsets of the words in the string table
+    (one more than the number of words), the counts of the words and the string table of
+    the UTF-8 encoded words sorted bytewise. All the numbers are unsigned little-endian 64-bit.
+
+    Args:
+        frequency_of_words (dict): frequency of the words present in the files
+        output_file (str, optional): name of the output file along with its path. Defaults to "words-histogram.bin".
+    """
+    entries = sorted((word.encode("utf-8"), count) for word, count in frequency_of_words.items())
+    offsets = array.array("Q", [0])
+    counts = array.array("Q")
+    for word, count in entries:
+        offsets.append(offsets[-1] + len(word))
+        counts.append(count)
+    tablesize = offsets[-1]
+    if sys.byteorder == "big":
+        offsets.byteswap()
+        counts.byteswap()
+    with open(output_file, "wb") as histogram_file:
+        histogram_file.write(_BINARY_HEADER.pack(_BINARY_MAGIC, _BINARY_VERSION, 0, len(entries), tablesize))
+        histogram_file.write(offsets.tobytes())
+        histogram_file.write(counts.tobytes())
+        for word, count in entries:
+            histogram_file.write(word)
+
+
+def open_binary_histogram(file: str = "words-histogram.bin") -> mmap.mmap:
+    """Memory-maps a histogram written by write_binary_histogram and checks its header.
+
+    Args:
+        file (str, optional): name of the binary histogram along with its path. Defaults to "words-histogram.bin".
+
+    Returns:
+        mmap.mmap: read-only memory map of the histogram
+    """
+    with open(file, "rb") as f:
+        histogram = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(histogram) < _BINARY_HEADER.size:
+        histogram.close()
+        raise ValueError(f"{file} is not a binary word histogram")
+    magic, version, reserved, size, tablesize = _BINARY_HEADER.unpack_from(histogram)
+    if magic != _BINARY_MAGIC or version != _BINARY_VERSION:
+        histogram.close()
+        raise ValueError(f"{file} is not a binary word histogram")
+    return histogram
+
+
+def binary_histogram_size(histogram: mmap.mmap) -> int:
+    """Returns the number of words stored in the binary histogram.
+
+    Args:
+        histogram (mmap.mmap): memory map returned by open_binary_histogram
+
+    Returns:
+        int: number of words
+    """
+    return _BINARY_HEADER.unpack_from(histogram)[3]
+
+
+def binary_histogram_entry(histogram: mmap.mmap, index: int) -> tuple:
+    """Returns the word at the given position of the sorted binary histogram and its count.
+
+    Args:
+        histogram (mmap.mmap): memory map returned by open_binary_histogram
+        index (int): position of the word, from 0 to binary_histogram_size(histogram) - 1
+
+    Returns:
+        tuple: the UTF-8 encoded word (bytes) and its count (int)
+    """
+    size = _BINARY_HEADER.unpack_from(histogram)[3]
+    offsetsstart = _BINARY_HEADER.size
+    countsstart = offsetsstart + 8 * (size + 1)
+    tablestart = countsstart + 8 * size
+    start, end = struct.unpack_from("<QQ", histogram, offsetsstart + 8 * index)
+    count, = struct.unpack_from("<Q", histogram, countsstart + 8 * index)
+    return histogram[tablestart + start:tablestart + end], count
+
+
+def binary_histogram_arrays(histogram: mmap.mmap) -> tuple:
+    """Loads all the words and counts of the binary histogram into memory, in sorted order.
+
+    Args:
+        histogram (mmap.mmap): memory map returned by open_binary_histogram
+
+    Returns:
+        tuple: list of the words (str) and array of their counts
+    """
+    size = _BINARY_HEADER.unpack_from(histogram)[3]
+    offsetsstart = _BINARY_HEADER.size
+    countsstart = offsetsstart + 8 * (size + 1)
+    tablestart = countsstart + 8 * size
+    offsets = array.array("Q", histogram[offsetsstart:countsstart])
+    counts = array.array("Q", histogram[countsstart:tablestart])
+    if sys.byteorder == "big":
+        offsets.byteswap()
+        counts.byteswap()
+    table = histogram[tablestart:tablestart + offsets[-1]] if size else b""
+    words = [table[offsets[index]:offsets[index + 1]].decode("utf-8") for index in range(size)]
+    return words, counts
+
+
+def lookup_word_count(histogram: mmap.mmap, word: str) -> int:
+    """Finds the count of a word in the binary histogram by binary search.
+
+    Args:
+        histogram (mmap.mmap): memory map returned by open_binary_histogram
+        word (str): word to look up
+
+    Returns:
+        int: frequency of the word, 0 if it is not present
+    """
+    key = word.encode("utf-8")
+    low, high = 0, binary_histogram_size(histogram)
+    while low < high:
+        middle = (low + high) // 2
+        entry, count = binary_histogram_entry(histogram, middle)
+        if entry < key:
+            low = middle + 1
+        elif entry > key:
+            high = middle
+        else:
+            return count
+    return 0
+
+
 # driver code
 if __name__ == "__main__":
-    # Prompt the user to enter a home directory to search for text files
-    home_path = input("Enter the home directory to search: ")
+    parser = argparse.ArgumentParser(description="Counts the words of the text files under a home directory and "
+                                                 "writes them and their histogram")
+    parser.add_argument("home_path", nargs="?", help="home directory to search for text files (prompted when omitted)")
+    parser.add_argument("--mode", choices=["serial", "parallel", "incremental", "approximate", "external"],
+                        default="serial", help="counting mode, see the get_words_and_frequency_* functions")
+    parser.add_argument("--words-output", default="words.txt",
+                        help="file of the words, written by the serial and parallel modes")
+    parser.add_argument("--histogram-output", default="words-histogram.txt", help="file of the histogram")
+    parser.add_argument("--binary-output", default=None, help="also writes the histogram in the binary format")
+    parser.add_argument("--order", choices=["insertion", "count", "alpha"], default=None,
+                        help="order of the histogram, defaults to insertion (alpha in the external mode)")
+    parser.add_argument("--top", type=int, default=None,
+                        help="only writes the most frequent words (100 by default in the approximate mode)")
+    # discovery of the text files
+    parser.add_argument("--include", action="append", default=None, help="glob pattern of the text files")
+    parser.add_argument("--exclude", action="append", default=[], help="glob pattern of the names to leave out")
+    parser.add_argument("--max-depth", type=int, default=None, help="deepest level of sub-directories")
+    parser.add_argument("--follow-symlinks", action="store_true", help="descends into linked directories")
+    parser.add_argument("--scan-workers", type=int, default=1,
+                        help="threads scanning the directories, more than one makes the order of the files vary")
+    # reading and tokenizing
+    parser.add_argument("--streaming", action="store_true", help="reads each file chunk by chunk")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="size of each chunk read")
+    parser.add_argument("--mmap", action="store_true", help="memory-maps each file in the streaming mode")
+    parser.add_argument("--tokenizer", choices=["text", "bytes"], default="text", help="tokenizer of the files")
+    parser.add_argument("--semantics", choices=["unicode", "ascii"], default="unicode",
+                        help="words of the bytes tokenizer")
+    parser.add_argument("--errors", choices=["replace", "skip", "latin-1"], default="replace",
+                        help="decoding policy of the bytes tokenizer")
+    parser.add_argument("--words-mode", choices=["batched", "none", "gzip", "zstd"], default="batched",
+                        help="output mode of the words")
+    # parallel mode
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes, 0 for the number of CPUs")
+    parser.add_argument("--strategy", choices=["file", "bytes"], default="file",
+                        help="chunking strategy of the files handed to the workers")
+    parser.add_argument("--chunk-bytes", type=int, default=1 << 20, help="byte budget of a chunk of files")
+    # incremental mode
+    parser.add_argument("--manifest", default="words-manifest.json", help="manifest of the previous run")
+    parser.add_argument("--hash", action="store_true", help="compares a content hash of the changed files")
+    # approximate mode
+    parser.add_argument("--width", type=int, default=1 << 18, help="counters in each row of the sketch")
+    parser.add_argument("--depth", type=int, default=4, help="rows of the sketch")
+    parser.add_argument("--capacity", type=int, default=None, help="words kept by Space-Saving")
+    # external mode
+    parser.add_argument("--max-words", type=int, default=1000000, help="words kept in memory before spilling")
+    parser.add_argument("--temporary-dir", default=None, help="directory of the run files")
+    arguments = parser.parse_args()
+    if arguments.mode == "external" and (arguments.order == "insertion" or arguments.binary_output is not None):
+        parser.error("the external mode writes the histogram in alpha or count order, and not in the binary format")
+
+    home_path = arguments.home_path
+    if home_path is None:
+        # Prompt the user to enter a home directory to search for text files
+        home_path = input("Enter the home directory to search: ")
 
-    # Find all the text files in the specified directory and its subdirectories
-    text_files = get_text_files(home_path)
+    # Find the text files in the specified directory and its subdirectories while they are processed
+    text_files = scan_files(home_path, tuple(arguments.include or ["*.txt"]), tuple(arguments.exclude),
+                            arguments.max_depth, arguments.follow_symlinks, arguments.scan_workers)
 
-    # Gets the list of words and its corresponding frequency and writes the words to a file
-    frequencyOfWords = get_words_and_frequency_write(text_files)
+    # Gets the list of words and its corresponding frequency, writing the words to a file in the exact modes
+    frequencyOfWords = None
+    undecodableTokens = collections.Counter()
+    if arguments.mode == "serial":
+        frequencyOfWords = get_words_and_frequency_write(text_files, arguments.words_output, arguments.streaming,
+                                                         arguments.chunk_size, arguments.mmap, arguments.words_mode,
+                                                         arguments.tokenizer, arguments.semantics, arguments.errors,
+                                                         undecodableTokens)
+    elif arguments.mode == "parallel":
+        frequencyOfWords = get_words_and_frequency_parallel(list(text_files), arguments.words_output,
+                                                            arguments.workers or None, arguments.strategy,
+                                                            arguments.chunk_bytes, arguments.streaming,
+                                                            arguments.chunk_size, arguments.mmap,
+                                                            arguments.words_mode, arguments.tokenizer,
+                                                            arguments.semantics, arguments.errors, undecodableTokens)
+    elif arguments.mode == "incremental":
+        frequencyOfWords = get_words_and_frequency_incremental(text_files, arguments.manifest, arguments.hash,
+                                                               arguments.streaming, arguments.chunk_size)
+    elif arguments.mode == "approximate":
+        frequencyOfWords, overcounts = get_words_and_frequency_approximate(
+            text_files, arguments.top or 100, arguments.width, arguments.depth, arguments.capacity,
+            arguments.chunk_size)
+        print(f"Each count may be overcounted by at most {max(overcounts.values(), default=0)}")
+    else:
+        # the external mode counts and writes the histogram itself, without holding the vocabulary
+        write_word_histogram_external(text_files, arguments.histogram_output, arguments.order or "alpha",
+                                      arguments.top, arguments.max_words, arguments.temporary_dir,
+                                      arguments.chunk_size, arguments.tokenizer)
 
     # Write the frequency of each word to a file
-    write_word_histogram(frequencyOfWords)
+    if frequencyOfWords is not None:
+        write_word_histogram(frequencyOfWords, arguments.histogram_output, arguments.order or "insertion",
+                             arguments.top)
+        if arguments.binary_output is not None:
+            write_binary_histogram(frequencyOfWords, arguments.binary_output)
+    if undecodableTokens:
+        policy = {"replace": "replaced", "skip": "dropped", "latin-1": "decoded as latin-1"}[arguments.errors]
+        print(f"{sum(undecodableTokens.values())} tokens in {len(undecodableTokens)} files could not be decoded "
+              f"and were {policy}", file=sys.stderr)
@@ -1,3 +1,16 @@
+import argparse
+import bisect
+import collections
+import functools
+import heapq
+import json
+import os
+import sys
+
+from main import (write_binary_histogram, open_binary_histogram, binary_histogram_size, binary_histogram_entry,
+                  binary_histogram_arrays)
+
+
 def gethistogram(file="words.txt"):
     freq = {}
     with open(file, "r") as filehandle:
@@ -12,22 +25,485 @@ def gethistogram(file="words.txt"):
     return freq
 
 
-def findprefix(pref):
-    freq = gethistogram()
-    res = {}
-    for name, count in freq.items():
-        if name.startswith(pref):
-            res[name] = count
-    result = dict(sorted(res.items(), key=lambda x: x[1], reverse=True))
+def build_top_completions(words, counts, k=10, threshold=128):
+    """Precomputes the k most frequent completions of every prefix matching more than
+    threshold words, by walking the implicit trie of the sorted words bottom-up: the top-k
+    of a prefix are picked among the top-k of its children. Prefixes matching at most
+    threshold words are cheap enough to rank when they are queried.
+
+    Args:
+        words (list): words sorted in code point order
+        counts (list): count of each word
+        k (int, optional): number of completions kept for each prefix. Defaults to 10.
+        threshold (int, optional): number of matches above which a prefix is precomputed. Defaults to 128.
+
+    Returns:
+        dict: prefix as key and positions of its top-k words (most frequent first) as value
+    """
+    table = {}
+
+    def visit(pref, start, end):
+        if end - start <= threshold:
+            return heapq.nlargest(k, range(start, end), key=counts.__getitem__)
+        depth = len(pref)
+        candidates = []
+        position = start
+        if len(words[position]) == depth:
+            candidates.append(position)
+            position += 1
+        while position < end:
+            child = words[position][:depth + 1]
+            childend = bisect.bisect_right(words, child, position, end, key=lambda word: word[:depth + 1])
+            candidates.extend(visit(child, position, childend))
+            position = childend
+        table[pref] = heapq.nlargest(k, sorted(candidates), key=counts.__getitem__)
+        return table[pref]
+
+    if words:
+        visit("", 0, len(words))
+    return table
+
+
+def read_word_counts(file="words.txt"):
+    """Counts the words of a words file (one word per line), or reads the counts of a histogram
+    file ("word - count" lines). The words never contain spaces, so a first line containing
+    " - " tells a histogram file apart.
+
+    Args:
+        file (str, optional): words or histogram file written by main.py. Defaults to "words.txt".
+
+    Returns:
+        collections.Counter: frequency of the words
+    """
+    with open(file, "r") as filehandle:
+        first = filehandle.readline()
+        filehandle.seek(0)
+        if " - " not in first:
+            freq = collections.Counter(line.rstrip("\n") for line in filehandle)
+            freq.pop("", None)
+            return freq
+        freq = collections.Counter()
+        for line in filehandle:
+            word, count = line.rstrip("\n").rsplit(" - ", 1)
+            freq[word] += int(count)
+        return freq
+
+
+def build_prefix_index(file="words.txt", index_file="words-index.bin", k=10, threshold=128):
+    """Counts the words of words.txt (or reads a histogram file) once and saves them as a sorted word array with counts,
+    in the binary histogram format of main.py, along with the top-k completions of the
+    common prefixes (see build_top_completions) in index_file + ".topk.json".
+
+    Args:
+        file (str, optional): words or histogram file written by main.py (see read_word_counts).
+                              Defaults to "words.txt".
+        index_file (str, optional): name of the index file along with its path. Defaults to "words-index.bin".
+        k (int, optional): number of completions precomputed for each common prefix. Defaults to 10.
+        threshold (int, optional): number of matches above which a prefix is precomputed. Defaults to 128.
+    """
+    freq = read_word_counts(file)
+    write_binary_histogram(freq, index_file)
+
+    words = sorted(freq)
+    table = build_top_completions(words, [freq[word] for word in words], k, threshold)
+    with open(index_file + ".topk.json", "w") as filehandle:
+        json.dump({"k": k, "threshold": threshold, "prefixes": table}, filehandle)
+
+
+class _SortedEntries:
+    """Read-only sequence view of the UTF-8 encoded words of a memory-mapped index, for bisect."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.size = binary_histogram_size(histogram)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return binary_histogram_entry(self.histogram, index)[0]
+
+
+# result of PrefixIndex.fuzzy_complete: (word, count, distance) tuples, and whether every matching
+# branch was searched (False when the budget of the query ran out before the k-th word)
+FuzzyCompletions = collections.namedtuple("FuzzyCompletions", ["completions", "exhaustive"])
+
+
+class PrefixIndex:
+    """Prefix lookups over the words of words.txt, backed by the index built by build_prefix_index.
+
+    The index is only opened (memory-mapped) on the first query, and rebuilt first if it is
+    missing or older than words.txt. A query costs a binary search for the range of words
+    starting with the prefix, plus the number of words in that range. The top-k completions
+    of common prefixes are precomputed, and recent completions are kept in an LRU cache.
+    """
+
+    def __init__(self, file="words.txt", index_file="words-index.bin", k=10, threshold=128, cache_size=4096):
+        """
+        Args:
+            file (str, optional): words file written by main.py. Defaults to "words.txt".
+            index_file (str, optional): name of the index file along with its path. Defaults to "words-index.bin".
+            k (int, optional): number of completions precomputed for each common prefix. Defaults to 10.
+            threshold (int, optional): number of matches above which a prefix is precomputed. Defaults to 128.
+            cache_size (int, optional): number of completions kept in the LRU cache. Defaults to 4096.
+        """
+        self.file = file
+        self.index_file = index_file
+        self.k = k
+        self.threshold = threshold
+        self.histogram = None
+        self.entries = None
+        self.top = None
+        self.words = None
+        self.counts = None
+        self.complete = functools.lru_cache(maxsize=cache_size)(self._complete)
+
+    def load(self):
+        """Opens the index, building it first when it is missing or out of date."""
+        if self.histogram is not None:
+            return
+        topk_file = self.index_file + ".topk.json"
+        if not os.path.exists(self.index_file) or not os.path.exists(topk_file) or (
+                os.path.exists(self.file) and os.path.getmtime(self.file) > os.path.getmtime(self.index_file)):
+            build_prefix_index(self.file, self.index_file, self.k, self.threshold)
+        with open(topk_file, "r") as filehandle:
+            top = json.load(filehandle)
+        if top["k"] != self.k or top["threshold"] != self.threshold:
+            build_prefix_index(self.file, self.index_file, self.k, self.threshold)
+            with open(topk_file, "r") as filehandle:
+                top = json.load(filehandle)
+        self.histogram = open_binary_histogram(self.index_file)
+        self.entries = _SortedEntries(self.histogram)
+        self.top = top["prefixes"]
+        self.words = None
+        self.counts = None
+        self.complete.cache_clear()
+
+    def prefix_range(self, pref, lo=0):
+        """Returns the positions [start, end) of the words starting with the prefix.
+
+        Args:
+            pref (str): prefix to look up
+            lo (int, optional): position known to be at or before the start, e.g. the start of a
+                                smaller prefix looked up before. Defaults to 0.
+
+        Returns:
+            tuple: start and end positions in the sorted index
+        """
+        self.load()
+        key = pref.encode("utf-8")
+        start = bisect.bisect_left(self.entries, key, lo)
+        # UTF-8 never contains the byte 0xff, so it sorts after every word starting with the prefix
+        end = bisect.bisect_left(self.entries, key + b"\xff", start)
+        return start, end
+
+    def find(self, pref):
+        """Returns the words starting with the prefix, most frequent first (ties alphabetical).
+
+        Args:
+            pref (str): prefix to look up
+
+        Returns:
+            list: (word, count) tuples
+        """
+        start, end = self.prefix_range(pref)
+        return self.rank(pref, None, start, end)
+
+    def top_positions(self, pref, k, start, end):
+        """Returns the positions of the k most frequent words of the range [start, end) of the
+        prefix, most frequent first (ties alphabetical), from the precomputed completions when possible.
+
+        Args:
+            pref (str): prefix the range belongs to
+            k (int): number of completions, None for all the words of the range
+            start (int): start position of the range, see prefix_range
+            end (int): end position of the range, see prefix_range
+
+        Returns:
+            list: positions in the sorted index
+        """
+        if k is not None and k <= self.k and pref in self.top:
+            return self.top[pref][:k]
+        if self.counts is not None:
+            count_at = self.counts.__getitem__
+        else:
+            count_at = lambda index: binary_histogram_entry(self.histogram, index)[1]
+        if k is None:
+            return sorted(range(start, end), key=count_at, reverse=True)
+        return heapq.nlargest(k, range(start, end), key=count_at)
+
+    def rank(self, pref, k, start, end):
+        """Returns the k most frequent words of the range [start, end) of the prefix, most frequent
+        first (ties alphabetical), see top_positions.
 
-    for name in result.keys():
+        Args:
+            pref (str): prefix the range belongs to
+            k (int): number of completions, None for all the words of the range
+            start (int): start position of the range, see prefix_range
+            end (int): end position of the range, see prefix_range
+
+        Returns:
+            list: (word, count) tuples
+        """
+        completions = []
+        for index in self.top_positions(pref, k, start, end):
+            word, count = binary_histogram_entry(self.histogram, index)
+            completions.append((word.decode("utf-8"), count))
+        return completions
+
+    def fuzzy_complete(self, pref, k=10, max_distance=1, max_nodes=20000):
+        """Returns the k most frequent words starting with a prefix within max_distance edits
+        (insertions, deletions or substitutions) of the given prefix, ranked by frequency, then
+        by distance, then alphabetically. The distance of a word is that of its closest prefix.
+
+        A Levenshtein automaton, kept as the band of one row of the edit distance table, walks the
+        implicit trie of the sorted words best first: the trie nodes wait in a heap keyed by the
+        highest count below them (the first of their precomputed completions, or the maximum of a
+        range of at most threshold words, which is then walked depth first), and a branch is pruned
+        as soon as no prefix below it can be within max_distance. The key of a node never exceeds
+        that of a word below it, so the words come out of the heap in their final order and the
+        walk stops after the k-th, without visiting the rarer branches. The words and counts are
+        loaded into memory on the first fuzzy query.
+
+        At most max_nodes trie nodes and words are visited, which bounds the latency of a query.
+        When the budget runs out, the words found so far are still the most frequent matches, in
+        order, but there may be fewer than k of them and exhaustive is False.
+
+        Args:
+            pref (str): prefix to look up, possibly with typos
+            k (int, optional): number of completions. Defaults to 10.
+            max_distance (int, optional): maximum edit distance of the prefix, 1 or 2. Defaults to 1.
+            max_nodes (int, optional): budget of trie nodes and words visited, None for no budget.
+                                       Defaults to 20000.
+
+        Returns:
+            FuzzyCompletions: (word, count, distance) tuples, and whether the search was exhaustive
+        """
+        self.load()
+        if self.words is None:
+            self.words, self.counts = binary_histogram_arrays(self.histogram)
+        words, counts = self.words, self.counts
+        # a word waits as (-count, distance, word, position) and a trie node as
+        # (-highest count, lowest distance, node, start, end, row, distance of the closest prefix)
+        heap = []
+        completions = []
+        budget = max_nodes
+        # distances above max_distance are all kept as cap, and a cell further than max_distance
+        # from the diagonal is always above it, so a step only computes the cells of the band
+        cap = max_distance + 1
+
+        def step(row, char, depth):
+            nextrow = [cap] * len(row)
+            nextrow[0] = min(depth, cap)
+            for column in range(max(1, depth - max_distance), min(len(row) - 1, depth + max_distance) + 1):
+                nextrow[column] = min(row[column] + 1, nextrow[column - 1] + 1,
+                                      row[column - 1] + (pref[column - 1] != char), cap)
+            return nextrow
+
+        def child_ranges(node, start, end, row, best):
+            # yields the children of a node which may still be within max_distance, with their ranges
+            depth = len(node)
+            if len(words[start]) == depth:
+                start += 1
+            if best > max_distance and min(row) == max_distance:
+                # on the edge, a child only stays within max_distance by matching a character of the prefix
+                for char in {pref[column - 1] for column in range(1, len(row)) if row[column - 1] == max_distance}:
+                    child = node + char
+                    childstart = bisect.bisect_left(words, child, start, end)
+                    childend = bisect.bisect_right(words, child, childstart, end, key=lambda word: word[:depth + 1])
+                    if childstart < childend:
+                        yield child, childstart, childend
+            elif end - start <= self.threshold:
+                # the words of a small range are grouped by their next character as they come
+                while start < end:
+                    char = words[start][depth]
+                    childend = start + 1
+                    while childend < end and words[childend][depth] == char:
+                        childend += 1
+                    yield node + char, start, childend
+                    start = childend
+            else:
+                while start < end:
+                    child = words[start][:depth + 1]
+                    childend = bisect.bisect_right(words, child, start, end, key=lambda word: word[:depth + 1])
+                    yield child, start, childend
+                    start = childend
+
+        def scan(node, start, end, row, best):
+            # walks a small range depth first, as the order of its words is not worth a heap;
+            # returns the number of trie nodes visited
+            visited = 1
+            if len(words[start]) == len(node) and best <= max_distance:
+                heapq.heappush(heap, (-counts[start], best, node, start))
+            for child, childstart, childend in child_ranges(node, start, end, row, best):
+                childrow = step(row, child[-1], len(child))
+                childbest = min(best, childrow[-1])
+                lowest = min(childrow)
+                if childbest <= max_distance and lowest >= childbest:
+                    # no longer prefix can be closer, so every word below is at the distance of this one
+                    for position in range(childstart, childend):
+                        heapq.heappush(heap, (-counts[position], childbest, words[position], position))
+                elif lowest <= max_distance:
+                    visited += scan(child, childstart, childend, childrow, childbest)
+            return visited
+
+        def push_node(node, start, end, row, best):
+            lowest = min(min(row), best)
+            if lowest > max_distance:
+                return
+            if end - start > self.threshold:
+                highest = counts[self.top[node][0]]
+            else:
+                highest = max(counts[start:end])
+            heapq.heappush(heap, (-highest, lowest, node, start, end, row, best))
+
+        if words:
+            push_node("", 0, len(words), [min(column, cap) for column in range(len(pref) + 1)], min(len(pref), cap))
+        while heap and len(completions) < k:
+            entry = heapq.heappop(heap)
+            if len(entry) == 4:
+                completions.append((entry[2], -entry[0], entry[1]))
+                continue
+            if budget is not None and budget <= 0:
+                heapq.heappush(heap, entry)
+                break
+            _, _, node, start, end, row, best = entry
+            if end - start <= self.threshold:
+                visited = scan(node, start, end, row, best)
+                if budget is not None:
+                    budget -= visited
+                continue
+            if budget is not None:
+                budget -= 1
+            if len(words[start]) == len(node) and best <= max_distance:
+                heapq.heappush(heap, (-counts[start], best, node, start))
+            for child, childstart, childend in child_ranges(node, start, end, row, best):
+                childrow = step(row, child[-1], len(child))
+                push_node(child, childstart, childend, childrow, min(best, childrow[-1]))
+        return FuzzyCompletions(completions, len(completions) == k or not heap)
+
+    def _complete(self, pref, k):
+        """Returns the k most frequent words starting with the prefix, most frequent first
+        (ties alphabetical). Called through complete, which is the LRU-cached version of it.
+
+        Args:
+            pref (str): prefix to look up
+            k (int): number of completions
+
+        Returns:
+            list: (word, count) tuples
+        """
+        self.load()
+        if k <= self.k and pref in self.top:
+            return self.rank(pref, k, None, None)
+        start, end = self.prefix_range(pref)
+        return self.rank(pref, k, start, end)
+
+
+_default_index = PrefixIndex()
+
+
+def findprefix(pref, index=None):
+    if index is None:
+        index = _default_index
+    for name, count in index.find(pref):
         print(name)
 
 
+def autocomplete(pref, k=10, index=None):
+    if index is None:
+        index = _default_index
+    for name, count in index.complete(pref, k):
+        print(name)
+
+
+def fuzzycomplete(pref, k=10, max_distance=1, index=None):
+    if index is None:
+        index = _default_index
+    result = index.fuzzy_complete(pref, k, max_distance)
+    for name, count, distance in result.completions:
+        print(name)
+    if not result.exhaustive:
+        print(f"(search budget ran out after {len(result.completions)} words)", file=sys.stderr)
+
+
+def batch_findprefix(prefixes, output_file, limit=10, index=None):
+    """Answers many prefix queries at once and streams the results to the output file as
+    "prefix<TAB>word<TAB>count" lines, the most frequent words of each prefix first.
+
+    The prefixes are deduplicated and sorted, so that the search for each range starts
+    where the range of the previous prefix started, and every query stops after limit words.
+
+    Args:
+        prefixes (iterable): prefixes to look up
+        output_file (TextIOWrapper): file handle to where the results are written
+        limit (int, optional): number of words written for each prefix, None for all. Defaults to 10.
+        index (PrefixIndex, optional): index to query. Defaults to the index of words.txt.
+    """
+    if index is None:
+        index = _default_index
+    index.load()
+    start = 0
+    for pref in sorted(set(prefixes)):
+        start, end = index.prefix_range(pref, start)
+        for word, count in index.rank(pref, limit, start, end):
+            output_file.write(f"{pref}\t{word}\t{count}\n")
+
+
+def batch_fuzzycomplete(prefixes, output_file, limit=10, max_distance=1, index=None):
+    """Answers many typo-tolerant queries (see PrefixIndex.fuzzy_complete) and streams the results
+    to the output file as "prefix<TAB>word<TAB>count<TAB>distance" lines, the most frequent words
+    of each prefix first. The prefixes whose search budget ran out are reported on stderr.
+
+    Args:
+        prefixes (iterable): prefixes to look up, possibly with typos
+        output_file (TextIOWrapper): file handle to where the results are written
+        limit (int, optional): number of words written for each prefix. Defaults to 10.
+        max_distance (int, optional): maximum edit distance of the prefixes. Defaults to 1.
+        index (PrefixIndex, optional): index to query. Defaults to the index of words.txt.
+    """
+    if index is None:
+        index = _default_index
+    for pref in prefixes:
+        result = index.fuzzy_complete(pref, limit, max_distance)
+        for word, count, distance in result.completions:
+            output_file.write(f"{pref}\t{word}\t{count}\t{distance}\n")
+        if not result.exhaustive:
+            print(f"Search budget ran out: {pref}", file=sys.stderr)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Finds the words of words.txt starting with a prefix")
+    parser.add_argument("--source", default="words.txt", help="words or histogram file the index is built from")
+    parser.add_argument("--index", default="words-index.bin", help="name of the index file")
+    parser.add_argument("--top", type=int, default=None, help="only shows the top completions of each prefix")
+    parser.add_argument("--batch", default=None, help="file of prefixes to answer at once, one per line, - for stdin")
+    parser.add_argument("--output", default="-", help="output file of the batch mode, - for stdout")
+    parser.add_argument("--limit", type=int, default=10, help="number of words for each prefix in the batch mode")
+    parser.add_argument("--fuzzy", type=int, default=None, metavar="N",
+                        help="also matches prefixes within N edits (1 or 2), most frequent first")
+    arguments = parser.parse_args()
+    _default_index = PrefixIndex(arguments.source, arguments.index)
+
+    if arguments.batch is not None:
+        inputfile = sys.stdin if arguments.batch == "-" else open(arguments.batch, "r")
+        outputfile = sys.stdout if arguments.output == "-" else open(arguments.output, "w")
+        with inputfile, outputfile:
+            prefix_lines = (line.rstrip("\n") for line in inputfile if line.strip())
+            if arguments.fuzzy is not None:
+                batch_fuzzycomplete(prefix_lines, outputfile, arguments.limit, arguments.fuzzy)
+            else:
+                batch_findprefix(prefix_lines, outputfile, arguments.limit)
+        sys.exit()
+
     while True:
         try:
             prefix = input("Enter prefix: ")
-            findprefix(prefix)
+            if arguments.fuzzy is not None:
+                fuzzycomplete(prefix, arguments.top or 10, arguments.fuzzy)
+            elif arguments.top is not None:
+                autocomplete(prefix, arguments.top)
+            else:
+                findprefix(prefix)
         except EOFError:
             break
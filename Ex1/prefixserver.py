@@ -0,0 +1,299 @@
+"""This module serves the prefix lookups of main2.py to many concurrent clients.
+
+It runs an asyncio server on localhost TCP or on a Unix socket. Each request is one
+line, either a bare prefix or a JSON object {"prefix": ..., "k": ...}, and is answered
+with one JSON line {"prefix": ..., "completions": [[word, count], ...]}. The line
+"STATS" returns the request latency percentiles and the queries per second.
+
+When the words file (or histogram file) changes, the index is rebuilt in a background
+thread and swapped in at once, while the queries already running keep the old index.
+
+Queries whose completions are neither precomputed nor in a small range of the index run
+in a worker thread, so that a query such as {"prefix": "", "k": 1000} does not stall the
+other clients. A request line longer than the line limit is discarded and answered with
+an error.
+
+The module also has a load-testing client which reports the latency percentiles and
+the queries per second seen from the clients' side.
+
+Created on: 18 Oct 2026
+
+"""
+
+# Importing argparse, asyncio, collections, json, os, random, sys and time for the server and the client
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import sys
+import time
+
+# Importing the prefix index of main2.py
+from main2 import PrefixIndex
+
+
+def percentiles(values: list, points: tuple = (50, 90, 99)) -> dict:
+    """Computes the nearest-rank percentiles of the values.
+
+    Args:
+        values (list): measured values
+        points (tuple, optional): percentiles to compute. Defaults to (50, 90, 99).
+
+    Returns:
+        dict: "p50", "p90"... as keys and the percentiles as values, None when there are no values
+    """
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        if not ordered:
+            result[f"p{point}"] = None
+            continue
+        rank = max(0, min(len(ordered) - 1, -(-point * len(ordered) // 100) - 1))
+        result[f"p{point}"] = ordered[rank]
+    return result
+
+
+class PrefixServer:
+    """Asyncio server answering prefix queries from a PrefixIndex which is hot reloaded."""
+
+    def __init__(self, source: str = "words.txt", index_file: str = "words-index.bin", k: int = 10,
+                 poll_interval: float = 1.0, latency_window: int = 10000, line_limit: int = 1 << 16):
+        """
+        Args:
+            source (str, optional): words or histogram file the index is built from. Defaults to "words.txt".
+            index_file (str, optional): base name of the index files. Defaults to "words-index.bin".
+            k (int, optional): default number of completions of a query. Defaults to 10.
+            poll_interval (float, optional): seconds between two checks of the source file. Defaults to 1.0.
+            latency_window (int, optional): number of recent latencies kept for the percentiles. Defaults to 10000.
+            line_limit (int, optional): longest request line in bytes. Defaults to 64 KiB.
+        """
+        self.source = source
+        self.index_file = index_file
+        self.k = k
+        self.poll_interval = poll_interval
+        self.line_limit = line_limit
+        self.generation = 0
+        self.index = None
+        self.source_mtime = None
+        self.failed_mtime = None
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.queries = 0
+        self.started = time.perf_counter()
+
+    def _build(self, generation: int) -> PrefixIndex:
+        """Builds and opens the index of a generation, in files of its own so that the
+        index in use is never overwritten."""
+        index_file = f"{self.index_file}.{generation}"
+        for file in (index_file, index_file + ".topk.json"):
+            if os.path.exists(file):
+                os.remove(file)
+        index = PrefixIndex(self.source, index_file, self.k)
+        index.load()
+        return index
+
+    def _remove_generation(self, generation: int) -> None:
+        """Removes the files of an old generation. An index still mapped keeps working on
+        POSIX systems, and on Windows the files are left in place."""
+        index_file = f"{self.index_file}.{generation}"
+        for file in (index_file, index_file + ".topk.json"):
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+    async def reload(self) -> None:
+        """Rebuilds the index in a background thread and swaps it in."""
+        mtime = os.path.getmtime(self.source)
+        generation = self.generation + 1
+        index = await asyncio.get_running_loop().run_in_executor(None, self._build, generation)
+        previous = self.generation
+        # a single assignment, so every query sees either the old or the new index
+        self.index, self.generation, self.source_mtime = index, generation, mtime
+        if previous:
+            self._remove_generation(previous)
+
+    async def watch(self) -> None:
+        """Polls the source file and reloads the index when it changes. A failed rebuild, such as
+        one of a file still being written, keeps the old index and is retried on the next poll."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                mtime = os.path.getmtime(self.source)
+                if mtime != self.source_mtime:
+                    await self.reload()
+            except OSError:
+                continue
+            except Exception as error:
+                # each version of the file is reported once, however many polls it fails
+                if mtime != self.failed_mtime:
+                    self.failed_mtime = mtime
+                    print(f"Reload of {self.source} failed, keeping generation {self.generation}: {error!r}",
+                          file=sys.stderr)
+
+    def stats(self) -> dict:
+        """Returns the latency percentiles in milliseconds and the queries per second."""
+        elapsed = time.perf_counter() - self.started
+        stats = {name: (value * 1000 if value is not None else None)
+                 for name, value in percentiles(list(self.latencies)).items()}
+        stats["queries"] = self.queries
+        stats["qps"] = self.queries / elapsed if elapsed else 0.0
+        stats["generation"] = self.generation
+        return stats
+
+    async def answer(self, line: str) -> dict:
+        """Answers one request line. A query which has to rank more words than the precomputing
+        threshold of the index runs in a worker thread instead of the event loop."""
+        if line == "STATS":
+            return self.stats()
+        if line.startswith("{"):
+            request = json.loads(line)
+            pref, k = request.get("prefix", ""), request.get("k", self.k)
+            if not isinstance(pref, str):
+                raise ValueError("prefix must be a string")
+            if not isinstance(k, int) or isinstance(k, bool) or k < 0:
+                raise ValueError("k must be a non-negative integer")
+        else:
+            pref, k = line, self.k
+        start = time.perf_counter()
+        # the index is taken once, so a reload during the query does not mix two generations
+        index = self.index
+        begin, end = index.prefix_range(pref)
+        if (k <= index.k and pref in index.top) or end - begin <= index.threshold:
+            completions = index.complete(pref, k)
+        else:
+            completions = await asyncio.get_running_loop().run_in_executor(None, index.complete, pref, k)
+        self.latencies.append(time.perf_counter() - start)
+        self.queries += 1
+        return {"prefix": pref, "completions": completions}
+
+    async def read_request(self, reader: asyncio.StreamReader) -> bytes:
+        """Reads one request line, like StreamReader.readline. A line longer than the line limit
+        is read to its end and discarded, so that its tail is not taken for the next request.
+
+        Raises:
+            ValueError: the line is longer than the line limit
+        """
+        overrun = False
+        while True:
+            try:
+                line = await reader.readuntil(b"\n")
+            except asyncio.IncompleteReadError as error:
+                # the client disconnected, possibly in the middle of the last line
+                return b"" if overrun else error.partial
+            except asyncio.LimitOverrunError as error:
+                await reader.readexactly(error.consumed)
+                overrun = True
+                continue
+            if overrun:
+                raise ValueError(f"request line longer than {self.line_limit} bytes")
+            return line
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answers the requests of one client, one line each, until it disconnects."""
+        try:
+            while True:
+                try:
+                    line = await self.read_request(reader)
+                    if not line:
+                        break
+                    response = await self.answer(line.decode("utf-8").rstrip("\r\n"))
+                except (ValueError, UnicodeDecodeError) as error:
+                    response = {"error": str(error)}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, unix_socket: str = None) -> None:
+        """Builds the first index and serves the clients forever.
+
+        Args:
+            host (str, optional): address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): TCP port to listen on. Defaults to 8765.
+            unix_socket (str, optional): path of a Unix socket to listen on instead of TCP. Defaults to None.
+        """
+        await self.reload()
+        if unix_socket is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path=unix_socket, limit=self.line_limit)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, limit=self.line_limit)
+        watcher = asyncio.create_task(self.watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+async def run_load_test(prefixes: list, clients: int = 16, requests: int = 1000, host: str = "127.0.0.1",
+                        port: int = 8765, unix_socket: str = None) -> dict:
+    """Sends prefix queries from many concurrent clients and measures them from the clients' side.
+
+    Args:
+        prefixes (list): prefixes picked at random for the queries
+        clients (int, optional): number of concurrent connections. Defaults to 16.
+        requests (int, optional): number of queries sent by each client. Defaults to 1000.
+        host (str, optional): address of the server. Defaults to "127.0.0.1".
+        port (int, optional): TCP port of the server. Defaults to 8765.
+        unix_socket (str, optional): path of the Unix socket of the server. Defaults to None.
+
+    Returns:
+        dict: latency percentiles in milliseconds, number of queries and queries per second
+    """
+    latencies = []
+
+    async def client(seed):
+        generator = random.Random(seed)
+        if unix_socket is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_socket)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        for _ in range(requests):
+            start = time.perf_counter()
+            writer.write(generator.choice(prefixes).encode("utf-8") + b"\n")
+            await writer.drain()
+            await reader.readline()
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+        await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(seed) for seed in range(clients)))
+    elapsed = time.perf_counter() - start
+    result = {name: value * 1000 for name, value in percentiles(latencies).items()}
+    result["queries"] = len(latencies)
+    result["qps"] = len(latencies) / elapsed
+    return result
+
+
+# driver code
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefix lookup server and load-testing client")
+    parser.add_argument("mode", choices=["serve", "bench"], help="run the server or the load-testing client")
+    parser.add_argument("--source", default="words.txt", help="words or histogram file the index is built from")
+    parser.add_argument("--index", default="words-index.bin", help="base name of the index files")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the server")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port of the server")
+    parser.add_argument("--unix", default=None, help="path of a Unix socket to use instead of TCP")
+    parser.add_argument("-k", type=int, default=10, help="default number of completions")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients of the load test")
+    parser.add_argument("--requests", type=int, default=1000, help="queries sent by each client")
+    parser.add_argument("--prefixes", default=None, help="file of prefixes for the load test, one per line")
+    arguments = parser.parse_args()
+
+    if arguments.mode == "serve":
+        asyncio.run(PrefixServer(arguments.source, arguments.index, arguments.k).serve(
+            arguments.host, arguments.port, arguments.unix))
+    else:
+        if arguments.prefixes is not None:
+            with open(arguments.prefixes, "r") as prefixfile:
+                prefix_list = [line.rstrip("\n") for line in prefixfile if line.strip()]
+        else:
+            prefix_list = [chr(code) for code in range(ord("a"), ord("z") + 1)]
+        report = asyncio.run(run_load_test(prefix_list, arguments.clients, arguments.requests, arguments.host,
+                                           arguments.port, arguments.unix))
+        print(json.dumps(report, indent=4))
@@ -0,0 +1,325 @@
+"""
+    This module benchmarks the line counting of codecounting.py on a
+    synthetic source tree, and checks its results against the counts
+    known by the generator of the tree.
+
+    The tree is reproducible from its seed and its parameters: the number
+    of files, of functions and classes per file, of methods per class, of
+    lines per body, the density of docstrings and comments, the nesting of
+    the blocks and the depth of the folders. The timings of traversefolder
+    and of each counting function can be saved as a baseline along with
+    those parameters, and a later run with the same parameters fails when
+    its throughput falls below the baseline by more than the threshold.
+    A run with other parameters, or with a missing baseline, fails too.
+
+    Created on: 18 Oct 2026
+"""
+
+# importing argparse, json, os, random, sys, tempfile and time for generating and timing the tree
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# importing the functions to be benchmarked
+import codecounting
+
+
+def generate_source(generator, functions=5, classes=3, methods=4, lines=10, docstrings=0.5, comments=0.2,
+                    nesting=2):
+    """
+    Generates the source code of a python file along with the result analyze_source is
+    expected to return for it.
+
+    The expected counts follow the definitions of the counters: the lines of a function
+    or method are its code lines (without comments and docstrings), and the lines of a
+    class are the indented code lines and closing docstring lines from the top of the file
+    up to the statement which follows the class, as the class counter never resets.
+
+    Args:
+        generator (Random): random generator of the tree
+        functions (int, optional): number of functions. Defaults to 5.
+        classes (int, optional): number of classes. Defaults to 3.
+        methods (int, optional): number of methods of each class. Defaults to 4.
+        lines (int, optional): number of statements in the body of each function and method. Defaults to 10.
+        docstrings (float, optional): probability of a docstring for the module and each definition. Defaults to 0.5.
+        comments (float, optional): probability of a comment before each statement. Defaults to 0.2.
+        nesting (int, optional): maximum depth of the nested blocks in the bodies. Defaults to 2.
+
+    Returns:
+        tuple: source code and the expected result of analyze_source (without "Errors")
+    """
+    source = []
+    counter = {"LinesFiltered": 0,
+               "Multiline": 0,
+               "Comments": 0,
+               "BlankLines": 0,
+               "Functions": 0,
+               "Classes": 0,
+               "Methods": 0}
+    classdict = {}
+    methoddict = {}
+    functiondict = {}
+    indented = [0]
+
+    def emit(line, kind="code"):
+        source.append(line)
+        if kind == "blank":
+            counter["BlankLines"] += 1
+        elif kind == "comment":
+            counter["Comments"] += 1
+        elif kind in ("docstring", "docstring end"):
+            counter["Multiline"] += 1
+        else:
+            counter["LinesFiltered"] += 1
+        if kind in ("code", "docstring end") and line.startswith("    "):
+            indented[0] += 1
+
+    def docstring(indent, name):
+        if generator.random() < docstrings:
+            emit(f'{indent}"""Summary of {name}', "docstring")
+            for line in range(generator.randint(0, 3)):
+                emit(f"{indent}Detail {line} of {name}", "docstring")
+            emit(f'{indent}End of {name}."""', "docstring end")
+
+    def body(indent, name):
+        level = 0
+        emit(f"{indent}value = a")
+        for line in range(lines):
+            prefix = indent + "    " * level
+            if generator.random() < comments:
+                emit(f"{prefix}# step {line} of {name}", "comment")
+            if line < lines - 1 and level < nesting and generator.random() < 0.25:
+                emit(f"{prefix}if value > {line}:")
+                level += 1
+            else:
+                emit(f"{prefix}value = value + {line}")
+                if level and generator.random() < 0.3:
+                    level -= 1
+        emit(f"{indent}return value")
+        return lines + 2
+
+    docstring("", "the module")
+    emit("", "blank")
+    emit("import os")
+    emit("", "blank")
+    definitions = ["function"] * functions + ["class"] * classes
+    generator.shuffle(definitions)
+    for number, definition in enumerate(definitions):
+        if definition == "function":
+            name = f"function_{number}"
+            emit(f"def {name}(a, b):")
+            counter["Functions"] += 1
+            docstring("    ", name)
+            functiondict[name] = body("    ", name)
+        else:
+            name = f"Class_{number}"
+            emit(f"class {name}(object):")
+            counter["Classes"] += 1
+            docstring("    ", name)
+            emit(f'    kind = "{name}"')
+            for method in range(methods):
+                emit("", "blank")
+                emit(f"    def method_{method}(self, a):")
+                counter["Methods"] += 1
+                docstring("        ", f"method_{method}")
+                methoddict[f"method_{method}"] = body("        ", f"method_{method}")
+            classdict[name] = indented[0]
+        emit("", "blank")
+        emit(f'exported = "{name}"')
+        emit("", "blank")
+    emit("", "blank")
+
+    result = {"TotalLOC": len(source),
+              "Counter": counter,
+              "Classes": classdict,
+              "Methods": methoddict,
+              "Functions": functiondict,
+              "OtherLines": codecounting.calcualte_other_lines(counter, classdict, functiondict)}
+    return "\n".join(source), result
+
+
+def generate_tree(directory, files=500, depth=2, seed=0, **options):
+    """
+    Generates a reproducible tree of python files, spread over folders depth levels deep.
+
+    Args:
+        directory (str): directory where the tree is created
+        files (int, optional): number of python files. Defaults to 500.
+        depth (int, optional): number of levels of folders below the directory. Defaults to 2.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+        **options: parameters of generate_source
+
+    Returns:
+        dict: expected result of analyze_source for each python file, by its path
+    """
+    generator = random.Random(seed)
+    expected = {}
+    for number in range(files):
+        levels = generator.randint(0, depth)
+        folder = os.path.join(directory, *(f"package{generator.randint(0, 3)}" for _ in range(levels)))
+        os.makedirs(folder, exist_ok=True)
+        file = os.path.join(folder, f"module{number}.py")
+        source, result = generate_source(generator, **options)
+        with open(file, "w") as filehandle:
+            filehandle.write(source)
+        expected[file] = result
+    return expected
+
+
+def check_ground_truth(expected):
+    """
+    Analyzes each generated file and compares the result with the one known by the generator.
+
+    Args:
+        expected (dict): expected result of analyze_source for each python file, by its path
+
+    Returns:
+        list: paths of the python files whose result differs
+    """
+    mismatches = []
+    for file, result in expected.items():
+        actual = codecounting.analyze_file(file)
+        del actual["Errors"]
+        # the order of the names is part of the report, so it is compared too
+        if actual != result or any(list(actual[key]) != list(result[key])
+                                   for key in ("Classes", "Methods", "Functions")):
+            mismatches.append(file)
+    return mismatches
+
+
+def benchmark_functions(homepath, files, repeat=3, workers=1):
+    """
+    Times traversefolder over the tree and each counting function over the sources held in memory,
+    keeping the best of repeat runs.
+
+    Args:
+        homepath (str): home path of the tree
+        files (list): paths of the python files of the tree
+        repeat (int, optional): number of runs of each benchmark. Defaults to 3.
+        workers (int, optional): number of worker processes of traversefolder. Defaults to 1.
+
+    Returns:
+        dict: seconds, files per second and lines per second of each benchmark, by its name
+    """
+    sources = [codecounting.read_python_file(file) for file in files]
+    totallines = sum(source.count("\n") + 1 for source in sources)
+
+    def traverse():
+        with open(os.devnull, "w") as handle:
+            codecounting.traversefolder(homepath, handle, workers)
+
+    def counting(function):
+        def run():
+            for source in sources:
+                function(source)
+        return run
+
+    benchmarks = {"traversefolder": traverse,
+                  "analyze_source": counting(codecounting.analyze_source),
+                  "breakdown_contents": counting(lambda source: codecounting.breakdown_contents(source, devnull)),
+                  "class_code_counter": counting(codecounting.class_code_counter),
+                  "method_code_counter": counting(codecounting.method_code_counter),
+                  "function_code_counter": counting(codecounting.function_code_counter)}
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        for name, benchmark in benchmarks.items():
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                benchmark()
+                times.append(time.perf_counter() - start)
+            best = min(times)
+            results[name] = {"seconds": best, "files_per_second": len(files) / best,
+                             "lines_per_second": totallines / best}
+    return results
+
+
+# options of the driver which generate the tree and the benchmarks, and so must match a baseline
+TREE_PARAMETERS = ("files", "functions", "classes", "methods", "lines", "docstrings", "comments", "nesting",
+                   "depth", "seed", "repeat", "workers")
+
+
+def compare_baseline(results, baseline, threshold=0.2):
+    """
+    Compares the throughput of each benchmark with the baseline.
+
+    Args:
+        results (dict): results of benchmark_functions
+        baseline (dict): results of benchmark_functions saved by an earlier run on the same tree
+        threshold (float, optional): fraction of the baseline throughput which may be lost. Defaults to 0.2.
+
+    Returns:
+        list: names of the benchmarks which regressed beyond the threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result["lines_per_second"] < baseline[name]["lines_per_second"] * (1 - threshold):
+            regressions.append(name)
+    return regressions
+
+
+# driver code
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the line counting of codecounting.py")
+    parser.add_argument("--files", type=int, default=500, help="number of python files to generate")
+    parser.add_argument("--functions", type=int, default=5, help="number of functions in each file")
+    parser.add_argument("--classes", type=int, default=3, help="number of classes in each file")
+    parser.add_argument("--methods", type=int, default=4, help="number of methods in each class")
+    parser.add_argument("--lines", type=int, default=10, help="number of statements in each function and method")
+    parser.add_argument("--docstrings", type=float, default=0.5, help="probability of a docstring on a definition")
+    parser.add_argument("--comments", type=float, default=0.2, help="probability of a comment before a statement")
+    parser.add_argument("--nesting", type=int, default=2, help="maximum depth of the nested blocks")
+    parser.add_argument("--depth", type=int, default=2, help="number of levels of folders")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated tree")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of each benchmark")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes of traversefolder")
+    parser.add_argument("--baseline", default=None, help="file of the baseline results")
+    parser.add_argument("--save-baseline", action="store_true", help="saves the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="fraction of throughput which may be lost")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tree:
+        truth = generate_tree(tree, arguments.files, arguments.depth, arguments.seed,
+                              functions=arguments.functions, classes=arguments.classes, methods=arguments.methods,
+                              lines=arguments.lines, docstrings=arguments.docstrings, comments=arguments.comments,
+                              nesting=arguments.nesting)
+        wrongfiles = check_ground_truth(truth)
+        timings = benchmark_functions(tree, list(truth), arguments.repeat, arguments.workers)
+
+    print(f"{'benchmark':<24}{'seconds':>10}{'files/s':>12}{'lines/s':>14}")
+    for benchmarkname, timing in timings.items():
+        print(f"{benchmarkname:<24}{timing['seconds']:>10.3f}{timing['files_per_second']:>12,.0f}"
+              f"{timing['lines_per_second']:>14,.0f}")
+
+    failures = []
+    if wrongfiles:
+        failures.append(f"{len(wrongfiles)} files counted differently from the generator, e.g. {wrongfiles[0]}")
+    if arguments.baseline is not None:
+        # the timings are only comparable on a tree generated with the same parameters
+        parameters = {name: getattr(arguments, name) for name in TREE_PARAMETERS}
+        if arguments.save_baseline:
+            with open(arguments.baseline, "w") as baselinefile:
+                json.dump({"parameters": parameters, "results": timings}, baselinefile, indent=2)
+        elif not os.path.exists(arguments.baseline):
+            failures.append(f"baseline {arguments.baseline} does not exist, save it with --save-baseline")
+        else:
+            with open(arguments.baseline, "r") as baselinefile:
+                saved = json.load(baselinefile)
+            savedparameters = saved.get("parameters", {})
+            differences = [f"{name} {savedparameters.get(name)} != {value}" for name, value in parameters.items()
+                           if savedparameters.get(name) != value]
+            if differences:
+                failures.append(f"baseline {arguments.baseline} was measured with other parameters: "
+                                f"{', '.join(differences)}")
+            else:
+                regressed = compare_baseline(timings, saved["results"], arguments.threshold)
+                if regressed:
+                    failures.append(f"throughput regressed by more than {arguments.threshold:.0%}: "
+                                    f"{', '.join(regressed)}")
+    if failures:
+        print("\n".join(failures), file=sys.stderr)
+        raise SystemExit(1)
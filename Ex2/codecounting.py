@@ -11,6 +11,28 @@
 # importing the os module to find out the python files
 import os
 
+# importing argparse, multiprocessing, sys and time for counting the files in parallel from the command line
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import sys
+import time
+
+# importing hashlib and json for caching the results of unchanged files
+import hashlib
+import json
+
+# importing csv, datetime and sqlite3 for the structured reports
+import csv
+import datetime
+import sqlite3
+
+# importing subprocess for reading the revisions of a git repository
+import subprocess
+
+# importing functools for sharing one analysis between the compatibility functions
+import functools
+
 
 def read_python_file(absolute_path):
     """
@@ -30,21 +52,32 @@ def read_python_file(absolute_path):
     return data
 
 
-def breakdown_contents(filecontents, filehandle=None):
+# quote marks that open or close a docstring
+DOCSTRING_QUOTES = ('"""', "'''")
+
+
+def analyze_source(src):
     """
-    Breaks down the source code and finds out the number
-    of blank lines, single line comments, multi line comments,
-    classes, methods and functions.
+    Walks the lines of the source code once and finds out the number of blank lines,
+    single line comments, multi line comments, classes, methods and functions, the
+    number of lines in each class, method and function, and the other lines of code.
+
+    Each line is stripped once and the counters of breakdown_contents, class_code_counter,
+    method_code_counter and function_code_counter are updated from it in the same pass.
+    The class counter keeps its own docstring state, since it closes a docstring before
+    checking whether the line opens one; the other three counters share one state.
+    A definition line without a name (such as "classes.append(x)", which the class
+    counter takes for a class) is recorded in "Errors" under the name of the counter
+    that fails on it, and the compatibility functions raise it as they used to.
 
     Args:
-        filecontents (str): source code of the python program
-        filehandle (TextIOWrapper): file handle of the file, to where the output is written.
-                                    Defaults to None.
+        src (str): source code of the python program
 
     Returns:
-        dict: dictionary containing the number
-        of blank lines, single line comments, multi line comments,
-        classes, methods and functions.
+        dict: dictionary containing the total LOC ("TotalLOC"), the counter dictionary
+        of breakdown_contents ("Counter"), the dictionaries of class_code_counter ("Classes"),
+        method_code_counter ("Methods") and function_code_counter ("Functions"),
+        the other lines of code ("OtherLines") and the errors of the counters ("Errors")
     """
     counter = {"LinesFiltered": 0,
                "Multiline": 0,
@@ -53,38 +86,155 @@ def breakdown_contents(filecontents, filehandle=None):
                "Functions": 0,
                "Classes": 0,
                "Methods": 0}
+    filtered = multiline = comments = blanklines = functions = classes = methods = 0
     isdocstring = False
-    lines = filecontents.split("\n")
-    print("Total LOC:", len(lines), file=filehandle)
+    classisdocstring = False
+    classcodecounter = methodcodecounter = functioncodecounter = 0
+    classcodedict = {}
+    methodcodedict = {}
+    functioncodedict = {}
+    classname = methodname = functionname = None
+    errors = {}
+    lines = src.split("\n")
     for line in lines:
+        stripped = line.strip()
+        closes = stripped.endswith(DOCSTRING_QUOTES)
+
+        # class counter
+        if closes:
+            classisdocstring = False
+        if not classisdocstring and stripped and stripped[0] != "#":
+            if stripped.startswith(DOCSTRING_QUOTES):
+                classisdocstring = True
+            elif stripped.startswith("class"):
+                try:
+                    classname = stripped.split(" ")[1].split("(")[0]
+                except IndexError as error:
+                    errors.setdefault("Classes", error)
+                if line.startswith("    "):
+                    classcodecounter += 1
+            else:
+                if line.startswith("    "):
+                    classcodecounter += 1
+                if line.split(" ", 1)[0].isalpha():
+                    classcodedict[classname] = classcodecounter
+                    classname = None
+
+        # line breakdown, method counter and function counter
         if isdocstring:
-            if line.strip().endswith('"""') or line.strip().endswith("'''"):
+            multiline += 1
+            if closes:
                 isdocstring = False
-                counter["Multiline"] += 1
-                continue
-            counter["Multiline"] += 1
             continue
-        if line.strip().startswith("#"):
-            counter["Comments"] += 1
+        if not stripped:
+            blanklines += 1
             continue
-        elif line.strip() == "":
-            counter["BlankLines"] += 1
+        if stripped[0] == "#":
+            comments += 1
             continue
-        if line.strip().startswith("'''") or line.strip().startswith('"""'):
-            counter["Multiline"] += 1
+        if stripped.startswith(DOCSTRING_QUOTES):
+            multiline += 1
             isdocstring = True
             continue
-        else:
-            counter["LinesFiltered"] += 1
+        filtered += 1
 
         if line.startswith("def"):
-            counter["Functions"] += 1
+            functions += 1
         elif line.startswith("class"):
-            counter["Classes"] += 1
+            classes += 1
         elif line.startswith("    def"):
-            counter["Methods"] += 1
+            methods += 1
+
+        firstword = stripped.split(" ", 1)[0].isalpha()
+        if not line.startswith("    "):
+            if line.startswith("def"):
+                if firstword:
+                    functioncodedict[functionname] = functioncodecounter
+                    functioncodecounter = 0
+                    try:
+                        functionname = line.lstrip().split(" ")[1].split("(")[0]
+                    except IndexError as error:
+                        errors.setdefault("Functions", error)
+            elif firstword and line.split(" ", 1)[0] != "class":
+                functioncodedict[functionname] = functioncodecounter
+                functionname = None
+                functioncodecounter = 0
+            if firstword and line.split(" ", 1)[0] != "class":
+                methodcodedict[methodname] = methodcodecounter
+                methodname = None
+                methodcodecounter = 0
+            continue
+
+        functioncodecounter += 1
+        if line.startswith("    def"):
+            if firstword:
+                methodcodedict[methodname] = methodcodecounter
+                methodcodecounter = 0
+                try:
+                    methodname = line.lstrip().split(" ")[1].split("(")[0]
+                except IndexError as error:
+                    errors.setdefault("Methods", error)
+        elif line.startswith("        "):
+            methodcodecounter += 1
+        elif firstword:
+            methodcodedict[methodname] = methodcodecounter
+            methodname = None
+            methodcodecounter = 0
+
+    for codedict in (classcodedict, methodcodedict, functioncodedict):
+        codedict.pop(None, None)
+    counter["LinesFiltered"] = filtered
+    counter["Multiline"] = multiline
+    counter["Comments"] = comments
+    counter["BlankLines"] = blanklines
+    counter["Functions"] = functions
+    counter["Classes"] = classes
+    counter["Methods"] = methods
+    return {"TotalLOC": len(lines),
+            "Counter": counter,
+            "Classes": classcodedict,
+            "Methods": methodcodedict,
+            "Functions": functioncodedict,
+            "OtherLines": calcualte_other_lines(counter, classcodedict, functioncodedict),
+            "Errors": errors}
+
+
+@functools.lru_cache(maxsize=1)
+def cached_analysis(src):
+    """
+    Returns analyze_source(src), keeping the result of the last source code, so that
+    breakdown_contents, class_code_counter, method_code_counter and function_code_counter
+    called one after the other on the same source code share a single pass over it.
+    The result is shared, so the compatibility functions only return copies of it.
+
+    Args:
+        src (str): source code of the python program
 
-    return counter
+    Returns:
+        dict: dictionary returned by analyze_source
+    """
+    return analyze_source(src)
+
+
+def breakdown_contents(filecontents, filehandle=None):
+    """
+    Breaks down the source code and finds out the number
+    of blank lines, single line comments, multi line comments,
+    classes, methods and functions.
+
+    Args:
+        filecontents (str): source code of the python program
+        filehandle (TextIOWrapper): file handle of the file, to where the output is written.
+                                    Defaults to None.
+
+    Returns:
+        dict: dictionary containing the number
+        of blank lines, single line comments, multi line comments,
+        classes, methods and functions.
+    """
+    result = cached_analysis(filecontents)
+    print("Total LOC:", result["TotalLOC"], file=filehandle)
+    return dict(result["Counter"])
 
 
 def class_code_counter(src):
@@ -97,54 +247,10 @@ def class_code_counter(src):
     Returns:
         dict: Dictionary containing the name of the class as key and number of lines in that respective class as value
     """
-    isdocstring = False
-    classcodecounter = 0
-    lines = src.split("\n")
-    classcodedict = {}
-    classname = None
-    for line in lines:
-        if line.strip().endswith('"""') or line.strip().endswith("'''"):
-            isdocstring = False
-        if isdocstring:
-            if line.strip().endswith('"""') or line.strip().endswith("'''"):
-                isdocstring = False
-                continue
-            continue
-        if line.strip().startswith("#"):
-            continue
-        elif line.strip() == "":
-            continue
-        if line.strip().startswith("'''") or line.strip().startswith('"""'):
-            isdocstring = True
-            continue
-        if line.strip().startswith("class"):
-            classname = line.strip().split(" ")[1].split("(")[0]
-            if isdocstring:
-                if line.strip().endswith('"""') or line.strip().endswith("'''"):
-                    isdocstring = False
-                    continue
-                continue
-            if line.strip().startswith("#"):
-                continue
-            elif line.strip() == "":
-                continue
-            if line.strip().startswith("'''") or line.strip().startswith('"""'):
-                isdocstring = True
-                continue
-            if line.startswith("    "):
-                classcodecounter += 1
-        else:
-            if line.startswith("    "):
-                classcodecounter += 1
-            if line.split(" ")[0].isalpha():
-                classcodedict[classname] = classcodecounter
-                classname = None
-                continue
-    try:
-        del classcodedict[None]
-    except KeyError:
-        pass
-    return classcodedict
+    result = cached_analysis(src)
+    if "Classes" in result["Errors"]:
+        raise result["Errors"]["Classes"].with_traceback(None)
+    return dict(result["Classes"])
 
 
 def method_code_counter(src):
@@ -157,57 +263,10 @@ def method_code_counter(src):
     Returns:
         dict: Dictionary containing the name of the method as key and number of lines in that respective method as value
     """
-    isdocstring = False
-    methodcodecounter = 0
-    lines = src.split("\n")
-    methodcodedict = {}
-    methodname = None
-    for line in lines:
-        if isdocstring:
-            if line.strip().endswith('"""') or line.strip().endswith("'''"):
-                isdocstring = False
-                continue
-            continue
-        if line.strip().startswith("#"):
-            continue
-        elif line.strip() == "":
-            continue
-        if line.strip().startswith("'''") or line.strip().startswith('"""'):
-            isdocstring = True
-            continue
-        if not line.startswith("    def"):
-            if line.startswith("        "):
-                methodcodecounter += 1
-            if line.strip().split(" ")[0].isalpha() and line.split(" ")[0] != "class" and not line.startswith(
-                    "        "):  # here is the change required
-                methodcodedict[methodname] = methodcodecounter
-                methodname = None
-                methodcodecounter = 0
-                continue
-        elif line.strip().split(" ")[0].isalpha() and line.split(" ")[0] != "class" and not line.startswith(
-                "        "):  # here is the change required
-            methodcodedict[methodname] = methodcodecounter
-            methodcodecounter = 0
-            methodname = line.lstrip().split(" ")[1].split("(")[0]
-            if isdocstring:
-                if line.strip().endswith('"""') or line.strip().endswith("'''"):
-                    isdocstring = False
-                    continue
-                continue
-            if line.strip().startswith("#"):
-                continue
-            elif line.strip() == "":
-                continue
-            if line.strip().startswith("'''") or line.strip().startswith('"""'):
-                isdocstring = True
-                continue
-            if line.startswith("        "):
-                methodcodecounter += 1
-    try:
-        del methodcodedict[None]
-    except KeyError:
-        pass
-    return methodcodedict
+    result = cached_analysis(src)
+    if "Methods" in result["Errors"]:
+        raise result["Errors"]["Methods"].with_traceback(None)
+    return dict(result["Methods"])
 
 
 def function_code_counter(src):
@@ -220,57 +279,10 @@ def function_code_counter(src):
     Returns: dict: Dictionary containing the name of the function as key and number of lines in that respective
     function as value
     """
-    isdocstring = False
-    functioncodecounter = 0
-    lines = src.split("\n")
-    functioncodedict = {}
-    functionname = None
-    for line in lines:
-        if isdocstring:
-            if line.strip().endswith('"""') or line.strip().endswith("'''"):
-                isdocstring = False
-                continue
-            continue
-        if line.strip().startswith("#"):
-            continue
-        elif line.strip() == "":
-            continue
-        if line.strip().startswith("'''") or line.strip().startswith('"""'):
-            isdocstring = True
-            continue
-        if not line.startswith("def"):
-            if line.startswith("    "):
-                functioncodecounter += 1
-            if line.strip().split(" ")[0].isalpha() and line.split(" ")[0] != "class" and not line.startswith(
-                    "    "):  # here is the change required
-                functioncodedict[functionname] = functioncodecounter
-                functionname = None
-                functioncodecounter = 0
-                continue
-        elif line.strip().split(" ")[0].isalpha() and line.split(" ")[0] != "class" and not line.startswith(
-                "    "):  # here is the change required
-            functioncodedict[functionname] = functioncodecounter
-            functioncodecounter = 0
-            functionname = line.lstrip().split(" ")[1].split("(")[0]
-            if isdocstring:
-                if line.strip().endswith('"""') or line.strip().endswith("'''"):
-                    isdocstring = False
-                    continue
-                continue
-            if line.strip().startswith("#"):
-                continue
-            elif line.strip() == "":
-                continue
-            if line.strip().startswith("'''") or line.strip().startswith('"""'):
-                isdocstring = True
-                continue
-            if line.startswith("    "):
-                functioncodecounter += 1
-    try:
-        del functioncodedict[None]
-    except KeyError:
-        pass
-    return functioncodedict
+    result = cached_analysis(src)
+    if "Functions" in result["Errors"]:
+        raise result["Errors"]["Functions"].with_traceback(None)
+    return dict(result["Functions"])
 
 
 def calcualte_other_lines(counterdict, classdict, functiondict):
@@ -291,66 +303,1024 @@ def calcualte_other_lines(counterdict, classdict, functiondict):
     return otherlines
 
 
-def traversefolder(homepath, filehandle=None):
-    """Traverses each folder and sub-folders recursively and finds out the
-    python files, and does the above operations and writes the data
-    to a file.
+def write_file_report(file, result, filehandle=None):
+    """Writes the report section of a python file from the result of analyze_source.
 
-    Args: homepath (str): home path where the python files are to be searched recursively. filehandle (TextIOWrapper,
-    optional): File handle of the file where the output will be written. Defaults to None.
+    Args: file (str): path of the python file. result (dict): result of analyze_source for the file.
+    filehandle (TextIOWrapper, optional): File handle of the file where the output will be written. Defaults to None.
+    """
+    counterdict = result["Counter"]
+    lines = ["=" * 26,
+             f"File: {file}",
+             f"Total LOC: {result['TotalLOC']}",
+             f"Filtered LOC: {counterdict['LinesFiltered']}",
+             f"Single Line Comments: {counterdict['Comments']}",
+             f"Multi Line Comments: {counterdict['Multiline']}",
+             f"Number of Functions: {counterdict['Functions']}",
+             f"Number of Classes: {counterdict['Classes']}",
+             f"Number of Methods: {counterdict['Methods']}",
+             "*" * 26,
+             "Classes:"]
+    lines.extend(f"{classname} - {count}" for classname, count in result["Classes"].items())
+    lines.extend(["*" * 26, "Methods:"])
+    lines.extend(f"{methodname} - {count}" for methodname, count in result["Methods"].items())
+    lines.extend(["*" * 26, "Functions:"])
+    lines.extend(f"{functionname} - {count}" for functionname, count in result["Functions"].items())
+    lines.extend(["*" * 26, f"Other Lines: {result['OtherLines']}", "=" * 26])
+    print("\n".join(lines), file=filehandle)
+
+
+def find_python_files(homepath):
+    """Traverses each folder and sub-folders recursively and finds out the python files.
+
+    Args:
+        homepath (str): home path where the python files are to be searched recursively
+
+    Returns:
+        list: paths of the python files, in the order of os.walk
     """
     pythonfiles = []
     for root, folders, files in os.walk(homepath):
         for file in files:
             if file.endswith(".py"):
                 pythonfiles.append(os.path.join(root, file))
+    return pythonfiles
 
-    for file in pythonfiles:
-        print("=" * 26, file=filehandle)
 
-        print("File:", file, file=filehandle)
+def analyze_file(file):
+    """Reads a python file and analyzes it with analyze_source. Run by the worker processes
+    of traversefolder, so the report is written by the parent alone.
+
+    Args:
+        file (str): path of the python file
+
+    Returns:
+        dict: result of analyze_source for the file
+    """
+    return analyze_source(read_python_file(file))
+
+
+def check_result(result):
+    """Raises the first error of the class, method and function counters of a result,
+    which the separate counters used to raise while traversing the folder.
+
+    Args:
+        result (dict): result of analyze_source
+    """
+    for key in ("Classes", "Methods", "Functions"):
+        if key in result["Errors"]:
+            raise result["Errors"][key]
+
+
+def file_digest(file):
+    """
+    Computes the SHA-256 hash of the contents of the file, reading it in blocks.
+
+    Args:
+        file (str): absolute path of the file
+
+    Returns:
+        str: hexadecimal digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file, "rb") as filehandle:
+        for block in iter(lambda: filehandle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_cache(cachefile):
+    """
+    Loads the cache written by a previous run, or returns an empty one. The cache records
+    the size, mtime, content hash and result of analyze_source of every python file.
+
+    Args:
+        cachefile (str): path of the cache file
+
+    Returns:
+        dict: cache with the "files" of the previous run
+    """
+    try:
+        with open(cachefile, "r") as filehandle:
+            cache = json.load(filehandle)
+    except FileNotFoundError:
+        return {"version": 1, "files": {}}
+    if cache.get("version") != 1:
+        return {"version": 1, "files": {}}
+    return cache
+
+
+def save_cache(cache, cachefile):
+    """
+    Writes the cache to a temporary file and moves it into place, so an interrupted
+    run never leaves a truncated cache behind.
+
+    Args:
+        cache (dict): cache with the "files"
+        cachefile (str): path of the cache file
+    """
+    temporaryfile = cachefile + ".tmp"
+    with open(temporaryfile, "w") as filehandle:
+        json.dump(cache, filehandle)
+    os.replace(temporaryfile, cachefile)
+
+
+def lookup_cache(cache, file):
+    """
+    Returns the cached result of a file if it did not change since it was cached. A file is
+    unchanged when its size and mtime match the entry; when only its mtime changed, its
+    contents are hashed and the entry is kept (with the new mtime) if the hash matches.
+
+    Args:
+        cache (dict): cache with the "files"
+        file (str): path of the python file
+
+    Returns:
+        tuple: the result of analyze_source or None, and the size and mtime of the file
+    """
+    stat = os.stat(file)
+    entry = cache["files"].get(file)
+    if entry is not None and entry["size"] == stat.st_size:
+        if entry["mtime"] == stat.st_mtime_ns:
+            return entry["result"], stat.st_size, stat.st_mtime_ns
+        if entry["hash"] == file_digest(file):
+            entry["mtime"] = stat.st_mtime_ns
+            return entry["result"], stat.st_size, stat.st_mtime_ns
+    return None, stat.st_size, stat.st_mtime_ns
+
+
+def analysis_worker(connection):
+    """
+    Analyzes the python files sent by analyze_files over the connection, one at a time,
+    and sends back the result of each, until it receives None. Run in a worker process.
+
+    Args:
+        connection (Connection): end of the pipe of the worker
+    """
+    for file in iter(connection.recv, None):
+        try:
+            result = analyze_file(file)
+        except Exception as error:
+            # the error is raised by the parent, as the serial run raises it
+            result = error
+        connection.send(result)
+    connection.close()
+
 
-        filecontents = read_python_file(file)
-        counterdict = breakdown_contents(filecontents, filehandle)
-        classdict = class_code_counter(filecontents)
-        methoddict = method_code_counter(filecontents)
-        functiondict = function_code_counter(filecontents)
-        otherlines = calcualte_other_lines(counterdict, classdict, functiondict)
+def start_worker():
+    """
+    Starts a worker process running analysis_worker. The worker is spawned rather than forked,
+    since a worker replacing a stuck one may be started while other threads hold locks, as in
+    the line counting stage of pipeline.py, and a forked child could inherit them held.
 
-        print(f"Filtered LOC: {counterdict['LinesFiltered']}", file=filehandle)
-        print(f"Single Line Comments: {counterdict['Comments']}", file=filehandle)
-        print(f"Multi Line Comments: {counterdict['Multiline']}", file=filehandle)
-        print(f"Number of Functions: {counterdict['Functions']}", file=filehandle)
-        print(f"Number of Classes: {counterdict['Classes']}", file=filehandle)
-        print(f"Number of Methods: {counterdict['Methods']}", file=filehandle)
+    Returns:
+        tuple: connection to the worker and its process
+    """
+    context = multiprocessing.get_context("spawn")
+    connection, workerend = context.Pipe()
+    process = context.Process(target=analysis_worker, args=(workerend,), daemon=True)
+    process.start()
+    workerend.close()
+    return connection, process
 
-        print("*" * 26, file=filehandle)
-        print("Classes:", file=filehandle)
 
-        for classname, count in classdict.items():
-            print(f"{classname} - {count}", file=filehandle)
+def stop_worker(connection, process):
+    """
+    Kills a worker process, such as one stuck on a file, and closes its connection.
 
-        print("*" * 26, file=filehandle)
-        print("Methods:", file=filehandle)
+    Args:
+        connection (Connection): connection to the worker
+        process (Process): process of the worker
+    """
+    process.kill()
+    process.join()
+    connection.close()
 
-        for methodname, count in methoddict.items():
-            print(f"{methodname} - {count}", file=filehandle)
 
-        print("*" * 26, file=filehandle)
-        print("Functions:", file=filehandle)
+def analyze_files(pythonfiles, workers=1, timeout=None, cache=None):
+    """
+    Analyzes the python files and yields their results in order, serially or across
+    worker processes, reusing the results of the cache for the files which did not change.
+
+    With more than one worker, or with a timeout, the files are analyzed by worker processes,
+    each handed one file at a time. A file which is not done within timeout seconds of its
+    worker starting on it, or whose worker dies, is yielded with None as its result; its worker
+    is killed and replaced, so the files after it are not held up.
+    The cache is updated in place: changed files get a new entry, and entries of files which
+    were not seen are evicted. Files whose counters failed are not cached.
+
+    Args:
+        pythonfiles (iterable): paths of the python files, which may still be coming from a traversal
+        workers (int, optional): number of worker processes, None for the number of CPUs. Defaults to 1.
+        timeout (float, optional): seconds allowed for the analysis of each file by a worker,
+                                   None to wait without limit. Defaults to None.
+        cache (dict, optional): cache loaded by load_cache, None to analyze every file. Defaults to None.
+
+    Yields:
+        tuple: path of the python file and its result of analyze_source, or None if it timed out
+    """
+    cached = {}
+    if cache is not None or workers != 1 or timeout is not None:
+        # only the serial run without a cache goes through the files once, as they come
+        pythonfiles = list(pythonfiles)
+    if cache is not None:
+        entries = {}
+        for file in pythonfiles:
+            result, size, mtime = lookup_cache(cache, file)
+            if result is not None:
+                cached[file] = result
+                entries[file] = cache["files"][file]
+            else:
+                entries[file] = {"size": size, "mtime": mtime}
+        cache["files"] = entries
 
-        for functionname, count in functiondict.items():
-            print(f"{functionname} - {count}", file=filehandle)
+    def store(file, result):
+        if cache is not None and not result["Errors"]:
+            entry = cache["files"][file]
+            entry["hash"] = file_digest(file)
+            entry["result"] = {key: value for key, value in result.items() if key != "Errors"}
 
-        print("*" * 26, file=filehandle)
-        print(f"Other Lines: {otherlines}", file=filehandle)
+    def finish(file, result):
+        if cache is not None and (result is None or result["Errors"]):
+            del cache["files"][file]
+        return file, result
+
+    if workers == 1 and timeout is None:
+        for file in pythonfiles:
+            if file in cached:
+                yield file, dict(cached[file], Errors={})
+                continue
+            result = analyze_file(file)
+            store(file, result)
+            yield finish(file, result)
+        return
+
+    pending = [file for file in pythonfiles if file not in cached]
+    results = {}
+    # a worker is idle as (connection, process) and busy as connection: (process, file, deadline)
+    idle = [start_worker() for _ in range(min(workers or os.cpu_count() or 1, len(pending)))]
+    busy = {}
+    nexttask = 0
+    try:
+        for file in pythonfiles:
+            if file in cached:
+                yield file, dict(cached[file], Errors={})
+                continue
+            while file not in results:
+                # an idle worker starts on the file as soon as it is sent, so its clock starts then
+                while idle and nexttask < len(pending):
+                    connection, process = idle.pop()
+                    connection.send(pending[nexttask])
+                    deadline = None if timeout is None else time.monotonic() + timeout
+                    busy[connection] = (process, pending[nexttask], deadline)
+                    nexttask += 1
+                deadlines = [deadline for _, _, deadline in busy.values() if deadline is not None]
+                waittime = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+                for connection in multiprocessing.connection.wait(list(busy), waittime):
+                    process, task, _ = busy.pop(connection)
+                    try:
+                        results[task] = connection.recv()
+                    except EOFError:
+                        # the worker died on the file, it is replaced like a worker which timed out
+                        results[task] = None
+                        stop_worker(connection, process)
+                        idle.append(start_worker())
+                        continue
+                    idle.append((connection, process))
+                now = time.monotonic()
+                for connection, (process, task, deadline) in list(busy.items()):
+                    if deadline is not None and deadline <= now:
+                        # the worker stuck on the file is killed, so the files after it are not held up
+                        del busy[connection]
+                        results[task] = None
+                        stop_worker(connection, process)
+                        idle.append(start_worker())
+            result = results.pop(file)
+            if isinstance(result, Exception):
+                raise result
+            if result is not None:
+                store(file, result)
+            yield finish(file, result)
+    finally:
+        for connection, process in idle:
+            connection.send(None)
+            connection.close()
+            process.join()
+        for connection, (process, _, _) in busy.items():
+            stop_worker(connection, process)
+
+
+# counters of a file which are summed into the totals of the directories and the repository,
+# with the names of their fields in the structured reports
+TOTAL_FIELDS = (("TotalLOC", "total_loc"),
+                ("LinesFiltered", "filtered_loc"),
+                ("Comments", "comments"),
+                ("Multiline", "multiline"),
+                ("BlankLines", "blank_lines"),
+                ("Functions", "functions"),
+                ("Classes", "classes"),
+                ("Methods", "methods"),
+                ("OtherLines", "other_lines"))
+
+
+def file_counts(result):
+    """
+    Returns the counters of a file in the order of TOTAL_FIELDS.
+
+    Args:
+        result (dict): result of analyze_source
 
+    Returns:
+        list: values of the counters
+    """
+    counterdict = result["Counter"]
+    return [result["TotalLOC"]] + [counterdict[key] for key, field in TOTAL_FIELDS[1:-1]] + [result["OtherLines"]]
+
+
+class TextSink:
+    """
+    Writes the human-readable loc.txt report, one section per file. The totals are not part of it.
+    """
+
+    def __init__(self, filehandle=None):
+        self.filehandle = filehandle
+
+    def write_file(self, file, result):
+        write_file_report(file, result, self.filehandle)
+
+    def write_totals(self, kind, path, files, counts):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """
+    Writes one JSON object per line: a "file" record for each python file, with the lines of
+    its classes, methods and functions, then a "directory" record for each directory and a
+    "repo" record with the totals. The lines are written in batches of batchsize records.
+    """
+
+    def __init__(self, output, repo, run, batchsize=1000):
+        self.filehandle = open(output, "w")
+        self.repo = repo
+        self.run = run
+        self.batchsize = batchsize
+        self.buffer = []
+
+    def write_record(self, record):
+        self.buffer.append(json.dumps(record) + "\n")
+        if len(self.buffer) >= self.batchsize:
+            self.filehandle.writelines(self.buffer)
+            self.buffer = []
+
+    def write_file(self, file, result):
+        record = {"type": "file", "run": self.run, "repo": self.repo, "path": file,
+                  "directory": os.path.dirname(file)}
+        record.update(zip((field for key, field in TOTAL_FIELDS), file_counts(result)))
+        record["class_lines"] = result["Classes"]
+        record["method_lines"] = result["Methods"]
+        record["function_lines"] = result["Functions"]
+        self.write_record(record)
+
+    def write_totals(self, kind, path, files, counts):
+        record = {"type": kind, "run": self.run, "repo": self.repo, "path": path, "files": files}
+        record.update(zip((field for key, field in TOTAL_FIELDS), counts))
+        self.write_record(record)
+
+    def close(self):
+        self.filehandle.writelines(self.buffer)
+        self.buffer = []
+        self.filehandle.close()
+
+
+class CsvSink:
+    """
+    Writes one CSV row per record, the kind of which is in the "record" column: "file" rows
+    with the counters of each python file, "class", "method" and "function" rows with the
+    lines of each one under its file, then "directory" and "repo" rows with the totals.
+    The rows are written in batches of batchsize rows.
+    """
+
+    def __init__(self, output, repo, run, batchsize=1000):
+        self.filehandle = open(output, "w", newline="")
+        self.writer = csv.writer(self.filehandle)
+        self.writer.writerow(["record", "run", "repo", "path", "name", "files"] +
+                             [field for key, field in TOTAL_FIELDS] + ["lines"])
+        self.repo = repo
+        self.run = run
+        self.batchsize = batchsize
+        self.buffer = []
+        self.empty = [""] * len(TOTAL_FIELDS)
+
+    def write_rows(self, rows):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.batchsize:
+            self.writer.writerows(self.buffer)
+            self.buffer = []
+
+    def write_file(self, file, result):
+        rows = [["file", self.run, self.repo, file, "", 1] + file_counts(result) + [""]]
+        for kind, key in (("class", "Classes"), ("method", "Methods"), ("function", "Functions")):
+            for name, count in result[key].items():
+                rows.append([kind, self.run, self.repo, file, name, ""] + self.empty + [count])
+        self.write_rows(rows)
+
+    def write_totals(self, kind, path, files, counts):
+        self.write_rows([[kind, self.run, self.repo, path, "", files] + list(counts) + [""]])
+
+    def close(self):
+        self.writer.writerows(self.buffer)
+        self.buffer = []
+        self.filehandle.close()
+
+
+class SqliteSink:
+    """
+    Inserts the results into a SQLite database, which keeps the history of every run:
+    the runs table has one row per run, the files table one row per python file with its
+    counters, the classes, methods and functions tables the lines of each one by file id,
+    and the directories and repos tables the totals. The tables are indexed on the run,
+    the repository, the paths and the file ids. The rows are inserted with executemany
+    in batches of batchsize files, all within the transaction of the run.
+    """
+
+    def __init__(self, output, repo, run, batchsize=1000):
+        counters = ", ".join(f"{field} INTEGER" for key, field in TOTAL_FIELDS)
+        self.connection = sqlite3.connect(output)
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, repo TEXT, started TEXT);
+            CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, run_id INTEGER, repo TEXT, path TEXT,
+                                              directory TEXT, {counters});
+            CREATE TABLE IF NOT EXISTS classes (file_id INTEGER, name TEXT, lines INTEGER);
+            CREATE TABLE IF NOT EXISTS methods (file_id INTEGER, name TEXT, lines INTEGER);
+            CREATE TABLE IF NOT EXISTS functions (file_id INTEGER, name TEXT, lines INTEGER);
+            CREATE TABLE IF NOT EXISTS directories (run_id INTEGER, repo TEXT, path TEXT, files INTEGER, {counters});
+            CREATE TABLE IF NOT EXISTS repos (run_id INTEGER, repo TEXT, path TEXT, files INTEGER, {counters});
+            CREATE INDEX IF NOT EXISTS runs_repo ON runs (repo);
+            CREATE INDEX IF NOT EXISTS files_run ON files (run_id);
+            CREATE INDEX IF NOT EXISTS files_repo_path ON files (repo, path);
+            CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+            CREATE INDEX IF NOT EXISTS classes_file ON classes (file_id);
+            CREATE INDEX IF NOT EXISTS methods_file ON methods (file_id);
+            CREATE INDEX IF NOT EXISTS functions_file ON functions (file_id);
+            CREATE INDEX IF NOT EXISTS directories_run_path ON directories (run_id, path);
+            CREATE INDEX IF NOT EXISTS repos_repo ON repos (repo, run_id);
+        """)
+        self.repo = repo
+        self.runid = self.connection.execute("INSERT INTO runs (repo, started) VALUES (?, ?)", (repo, run)).lastrowid
+        # the ids of the files are given out here, so the rows of a batch can refer to them
+        self.nextid = self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM files").fetchone()[0]
+        self.batchsize = batchsize
+        self.buffer = {"files": [], "classes": [], "methods": [], "functions": []}
+        self.pendingfiles = 0
+        placeholders = ", ".join("?" * len(TOTAL_FIELDS))
+        self.statements = {"files": f"INSERT INTO files VALUES (?, ?, ?, ?, ?, {placeholders})",
+                           "classes": "INSERT INTO classes VALUES (?, ?, ?)",
+                           "methods": "INSERT INTO methods VALUES (?, ?, ?)",
+                           "functions": "INSERT INTO functions VALUES (?, ?, ?)",
+                           "directory": f"INSERT INTO directories VALUES (?, ?, ?, ?, {placeholders})",
+                           "repo": f"INSERT INTO repos VALUES (?, ?, ?, ?, {placeholders})"}
+
+    def flush(self):
+        for table, rows in self.buffer.items():
+            if rows:
+                self.connection.executemany(self.statements[table], rows)
+                rows.clear()
+        self.pendingfiles = 0
+
+    def write_file(self, file, result):
+        fileid = self.nextid
+        self.nextid += 1
+        self.buffer["files"].append([fileid, self.runid, self.repo, file, os.path.dirname(file)] +
+                                    file_counts(result))
+        for table, key in (("classes", "Classes"), ("methods", "Methods"), ("functions", "Functions")):
+            self.buffer[table].extend((fileid, name, count) for name, count in result[key].items())
+        self.pendingfiles += 1
+        if self.pendingfiles >= self.batchsize:
+            self.flush()
+
+    def write_totals(self, kind, path, files, counts):
+        self.connection.execute(self.statements[kind], [self.runid, self.repo, path, files] + list(counts))
+
+    def close(self):
+        self.flush()
+        self.connection.commit()
+        self.connection.close()
+
+
+def open_sink(outputformat, output=None, repo=None, batchsize=1000):
+    """
+    Opens the sink of a report format.
+
+    Args:
+        outputformat (str): "text", "jsonl", "csv" or "sqlite"
+        output (str or TextIOWrapper, optional): file handle of the text report, or path of the
+                                                 other reports. Defaults to None.
+        repo (str, optional): path of the repository recorded in the structured reports. Defaults to None.
+        batchsize (int, optional): number of records (files for sqlite) written at once. Defaults to 1000.
+
+    Returns:
+        TextSink, JsonLinesSink, CsvSink or SqliteSink: sink of the report
+    """
+    if outputformat == "text":
+        return TextSink(output)
+    run = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    sinks = {"jsonl": JsonLinesSink, "csv": CsvSink, "sqlite": SqliteSink}
+    if outputformat not in sinks:
+        raise ValueError(f"Unknown report format: {outputformat}")
+    return sinks[outputformat](output, repo, run, batchsize)
+
+
+def traversefolder(homepath, filehandle=None, workers=1, timeout=None, cachefile=None, sink=None):
+    """Traverses each folder and sub-folders recursively and finds out the
+    python files, and does the above operations and writes the data
+    to a file.
+
+    With more than one worker, or with a timeout, the files are analyzed by worker processes
+    and the parent writes their sections in the same order as the serial version (see
+    analyze_files). A file which timed out is left out of the report and returned. With a
+    cache file, only the files which changed since the previous run are read and analyzed.
+    With a sink (see open_sink), the results are streamed to it instead of the text report
+    while the folder is traversed, followed by the totals of each directory (including its
+    sub-folders) and of the home path; the sink is closed at the end.
+
+    Args: homepath (str): home path where the python files are to be searched recursively. filehandle (TextIOWrapper,
+    optional): File handle of the file where the output will be written. Defaults to None. workers (int, optional):
+    number of worker processes, None for the number of CPUs. Defaults to 1. timeout (float, optional): seconds allowed
+    for the analysis of each file by a worker, None to wait without limit. Defaults to None. cachefile (str,
+    optional): path of the cache of the results, None to analyze every file. Defaults to None. sink (optional): sink
+    of a structured report, None to write the text report to filehandle. Defaults to None.
+
+    Returns:
+        list: paths of the python files which timed out
+    """
+    return report_python_files(find_python_files(homepath), homepath, filehandle, workers, timeout, cachefile, sink)
+
+
+def report_python_files(pythonfiles, homepath, filehandle=None, workers=1, timeout=None, cachefile=None, sink=None):
+    """Does the operations of traversefolder on python files found by the caller, such as a
+    traversal shared with other analyses, and writes the data to a file in the order of the files.
+
+    Args: pythonfiles (iterable): paths of the python files under the home path, which may still be coming from a
+    traversal. homepath (str): home path of the files, whose folders get the totals. The other arguments are those
+    of traversefolder.
+
+    Returns:
+        list: paths of the python files which timed out
+    """
+    cache = load_cache(cachefile) if cachefile is not None else None
+
+    if sink is None:
+        sink = TextSink(filehandle)
+    totals = {}
+    timedout = []
+    try:
+        for file, result in analyze_files(pythonfiles, workers, timeout, cache):
+            if result is None:
+                timedout.append(file)
+                continue
+            check_result(result)
+            sink.write_file(file, result)
+            # the counters are added to the totals of the folder of the file and of every folder above it
+            counts = [1] + file_counts(result)
+            relative = os.path.relpath(os.path.dirname(file), homepath)
+            parts = [] if relative == os.curdir else relative.split(os.sep)
+            for depth in range(len(parts) + 1):
+                total = totals.setdefault(os.path.join(homepath, *parts[:depth]), [0] * len(counts))
+                for index, count in enumerate(counts):
+                    total[index] += count
+
+        for directory in sorted(totals):
+            sink.write_totals("directory", directory, totals[directory][0], totals[directory][1:])
+        total = totals.get(homepath, [0] * (len(TOTAL_FIELDS) + 1))
+        sink.write_totals("repo", homepath, total[0], total[1:])
+    finally:
+        sink.close()
+
+    if cache is not None:
+        save_cache(cache, cachefile)
+    return timedout
+
+
+def code_lines(src):
+    """
+    Returns the lines of the source code which breakdown_contents counts as filtered LOC,
+    that is without the blank lines, single line comments and multi line comments.
+
+    Args:
+        src (str): source code of the python program
+
+    Returns:
+        list: lines of code
+    """
+    lines = []
+    isdocstring = False
+    for line in src.split("\n"):
+        stripped = line.strip()
+        if isdocstring:
+            if stripped.endswith(DOCSTRING_QUOTES):
+                isdocstring = False
+            continue
+        if not stripped or stripped[0] == "#":
+            continue
+        if stripped.startswith(DOCSTRING_QUOTES):
+            isdocstring = True
+            continue
+        lines.append(line)
+    return lines
+
+
+def middle_snake(a, alo, ahi, b, blo, bhi):
+    """
+    Finds the middle snake of the shortest edit script between a[alo:ahi] and b[blo:bhi]
+    (Myers, "An O(ND) difference algorithm and its variations", section 4b), searching
+    forwards from the start and backwards from the end at the same time in linear space.
+
+    Args:
+        a (list): old lines, as integers
+        alo (int): start of the old range
+        ahi (int): end of the old range
+        b (list): new lines, as integers
+        blo (int): start of the new range
+        bhi (int): end of the new range
+
+    Returns:
+        tuple: offsets (x, y) in the ranges where the script splits in two, or None when
+        the ranges have no line in common
+    """
+    n = ahi - alo
+    m = bhi - blo
+    maxd = (n + m + 1) // 2
+    offset = maxd
+    forward = [-1] * (2 * maxd + 2)
+    backward = [-1] * (2 * maxd + 2)
+    forward[offset + 1] = 0
+    backward[offset + 1] = 0
+    delta = n - m
+    # with an odd delta the paths meet while extending forwards, else while extending backwards
+    odd = delta % 2 != 0
+    forwardstart = forwardend = backwardstart = backwardend = 0
+    for d in range(maxd):
+        for k in range(-d + forwardstart, d + 1 - forwardend, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            if x > n:
+                forwardend += 2
+            elif y > m:
+                forwardstart += 2
+            elif odd:
+                other = offset + delta - k
+                if 0 <= other < len(backward) and backward[other] != -1 and x >= n - backward[other]:
+                    return x, y
+        for k in range(-d + backwardstart, d + 1 - backwardend, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[ahi - x - 1] == b[bhi - y - 1]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if x > n:
+                backwardend += 2
+            elif y > m:
+                backwardstart += 2
+            elif not odd:
+                other = offset + delta - k
+                if 0 <= other < len(forward) and forward[other] != -1:
+                    x1 = forward[other]
+                    if x1 >= n - x:
+                        return x1, x1 - (delta - k)
+    return None
+
+
+def diff_lines(a, b):
+    """
+    Computes the shortest edit script between two lists of lines (the longest common
+    subsequence), and returns its hunks. The lines are compared as integers, each
+    distinct line being given one id, so the comparisons never touch the strings.
+    Lines found in only one of the lists can never match and are left out of the
+    search, which keeps rewritten files fast; they are put back into their hunks.
+
+    Args:
+        a (list): old lines
+        b (list): new lines
+
+    Returns:
+        list: (deleted, added) number of lines of each hunk, in order
+    """
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a]
+    b = [ids.setdefault(line, len(ids)) for line in b]
+    alength = len(a)
+    blength = len(b)
+    common = set(a).intersection(b)
+    apositions = [position for position, line in enumerate(a) if line in common]
+    bpositions = [position for position, line in enumerate(b) if line in common]
+    a = [a[position] for position in apositions]
+    b = [b[position] for position in bpositions]
+    # matched pairs of positions in the lists of common lines, in order
+    matches = []
+
+    def diff(alo, ahi, blo, bhi):
+        # the common head and tail are matched first, so the middle snake only sees the changes
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        tail = []
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            tail.append((ahi, bhi))
+        if alo < ahi and blo < bhi:
+            split = middle_snake(a, alo, ahi, b, blo, bhi)
+            if split is not None:
+                diff(alo, alo + split[0], blo, blo + split[1])
+                diff(alo + split[0], ahi, blo + split[1], bhi)
+        matches.extend(reversed(tail))
+
+    diff(0, len(a), 0, len(b))
+
+    # the lines between two matched lines form one hunk
+    hunks = []
+    previous = (-1, -1)
+    for oldposition, newposition in [(apositions[i], bpositions[j]) for i, j in matches] + [(alength, blength)]:
+        deleted = oldposition - previous[0] - 1
+        added = newposition - previous[1] - 1
+        if deleted or added:
+            hunks.append((deleted, added))
+        previous = (oldposition, newposition)
+    return hunks
+
+
+def count_delta(oldsrc, newsrc):
+    """
+    Counts the added, modified and deleted lines of code between two versions of a python
+    file. Only the lines counted as filtered LOC by breakdown_contents are compared, and
+    within each hunk of the diff a deleted line paired with an added line is a modified line.
+
+    Args:
+        oldsrc (str): old source code, None when the file was added
+        newsrc (str): new source code, None when the file was deleted
+
+    Returns:
+        dict: number of "Added", "Modified" and "Deleted" lines of code
+    """
+    oldlines = code_lines(oldsrc) if oldsrc is not None else []
+    newlines = code_lines(newsrc) if newsrc is not None else []
+    delta = {"Added": 0, "Modified": 0, "Deleted": 0}
+    for deleted, added in diff_lines(oldlines, newlines):
+        modified = min(deleted, added)
+        delta["Modified"] += modified
+        delta["Added"] += added - modified
+        delta["Deleted"] += deleted - modified
+    return delta
+
+
+def snapshot_delta(changed, added, deleted, readold, readnew, digestold, digestnew):
+    """
+    Counts the LOC delta of the files of two snapshots. The changed files are diffed; an added
+    file with the same contents as a deleted one is taken as moved, and the others are counted
+    as wholly added or deleted.
+
+    Args:
+        changed (list): relative paths of the files present in both snapshots with different contents
+        added (list): relative paths of the files present only in the new snapshot
+        deleted (list): relative paths of the files present only in the old snapshot
+        readold (function): returns the old source code of a relative path
+        readnew (function): returns the new source code of a relative path
+        digestold (function): returns the hash of the old contents of a relative path
+        digestnew (function): returns the hash of the new contents of a relative path
+
+    Returns:
+        tuple: list of the delta of each file (a dict with its "Path", "Status", "From" for a
+        moved file, and its "Added", "Modified" and "Deleted" LOC), and the total delta
+    """
+    entries = []
+    for path in changed:
+        entry = {"Path": path, "Status": "modified"}
+        entry.update(count_delta(readold(path), readnew(path)))
+        entries.append(entry)
+
+    deletedbydigest = {}
+    for path in deleted:
+        deletedbydigest.setdefault(digestold(path), []).append(path)
+    for path in added:
+        origins = deletedbydigest.get(digestnew(path))
+        if origins:
+            entries.append({"Path": path, "Status": "moved", "From": origins.pop(0),
+                            "Added": 0, "Modified": 0, "Deleted": 0})
+            continue
+        entry = {"Path": path, "Status": "added"}
+        entry.update(count_delta(None, readnew(path)))
+        entries.append(entry)
+    for paths in deletedbydigest.values():
+        for path in paths:
+            entry = {"Path": path, "Status": "deleted"}
+            entry.update(count_delta(readold(path), None))
+            entries.append(entry)
+
+    entries.sort(key=lambda entry: entry["Path"])
+    total = {"Added": 0, "Modified": 0, "Deleted": 0}
+    for entry in entries:
+        for key in total:
+            total[key] += entry[key]
+    return entries, total
+
+
+def tree_delta(oldpath, newpath):
+    """
+    Counts the LOC delta between two directory trees. Files are matched by their path relative
+    to each tree. A path which is the same file in both trees, as in a hard-linked snapshot, is
+    not read; a file with the same size in both trees is hashed before it is diffed, since an
+    equal mtime does not mean equal contents.
+
+    Args:
+        oldpath (str): home path of the old tree
+        newpath (str): home path of the new tree
+
+    Returns:
+        tuple: delta of each file and total delta, see snapshot_delta
+    """
+    oldfiles = {os.path.relpath(file, oldpath): file for file in find_python_files(oldpath)}
+    newfiles = {os.path.relpath(file, newpath): file for file in find_python_files(newpath)}
+    changed = []
+    for path in oldfiles.keys() & newfiles.keys():
+        oldstat = os.stat(oldfiles[path])
+        newstat = os.stat(newfiles[path])
+        if os.path.samestat(oldstat, newstat):
+            continue
+        if oldstat.st_size == newstat.st_size and file_digest(oldfiles[path]) == file_digest(newfiles[path]):
+            continue
+        changed.append(path)
+    added = sorted(newfiles.keys() - oldfiles.keys())
+    deleted = sorted(oldfiles.keys() - newfiles.keys())
+    return snapshot_delta(changed, added, deleted,
+                          lambda path: read_python_file(oldfiles[path]),
+                          lambda path: read_python_file(newfiles[path]),
+                          lambda path: file_digest(oldfiles[path]),
+                          lambda path: file_digest(newfiles[path]))
+
+
+def git_python_blobs(repository, revision):
+    """
+    Lists the python files of a revision of a git repository along with the ids of their blobs.
+
+    Args:
+        repository (str): path of the git repository
+        revision (str): revision, such as a commit id, a branch or a tag
+
+    Returns:
+        dict: id of the blob of each python file, by its path
+    """
+    listing = subprocess.run(["git", "-C", repository, "ls-tree", "-r", "-z", "--full-tree", revision],
+                             capture_output=True, check=True).stdout
+    blobs = {}
+    for record in listing.split(b"\0"):
+        if not record:
+            continue
+        information, path = record.split(b"\t", 1)
+        mode, kind, blob = information.split()
+        path = path.decode("utf-8", "surrogateescape")
+        if kind == b"blob" and path.endswith(".py"):
+            blobs[path] = blob.decode("ascii")
+    return blobs
+
+
+def read_git_blobs(repository, blobs):
+    """
+    Reads the contents of blobs of a git repository with a single git cat-file process, and
+    decodes them with the newlines translated as read_python_file does.
+
+    Args:
+        repository (str): path of the git repository
+        blobs (iterable): ids of the blobs
+
+    Returns:
+        dict: source code of each blob, by its id
+    """
+    blobs = list(dict.fromkeys(blobs))
+    if not blobs:
+        return {}
+    request = "\n".join(blobs).encode("ascii") + b"\n"
+    output = subprocess.run(["git", "-C", repository, "cat-file", "--batch"], input=request,
+                            capture_output=True, check=True).stdout
+    contents = {}
+    position = 0
+    for blob in blobs:
+        header_end = output.index(b"\n", position)
+        size = int(output[position:header_end].split()[2])
+        data = output[header_end + 1:header_end + 1 + size]
+        contents[blob] = data.decode("utf-8", "replace").replace("\r\n", "\n").replace("\r", "\n")
+        position = header_end + 1 + size + 1
+    return contents
+
+
+def git_delta(repository, oldrevision, newrevision):
+    """
+    Counts the LOC delta between two revisions of a local git repository. Files whose blob is
+    the same in both revisions are identical and are not read, and the blobs of the other files
+    are read in one batch.
+
+    Args:
+        repository (str): path of the git repository
+        oldrevision (str): old revision
+        newrevision (str): new revision
+
+    Returns:
+        tuple: delta of each file and total delta, see snapshot_delta
+    """
+    oldblobs = git_python_blobs(repository, oldrevision)
+    newblobs = git_python_blobs(repository, newrevision)
+    changed = sorted(path for path in oldblobs.keys() & newblobs.keys() if oldblobs[path] != newblobs[path])
+    added = sorted(newblobs.keys() - oldblobs.keys())
+    deleted = sorted(oldblobs.keys() - newblobs.keys())
+    # moved files keep their blob, so they never need to be read
+    moved = set(oldblobs[path] for path in deleted) & set(newblobs[path] for path in added)
+    oldneeded = [oldblobs[path] for path in changed + deleted if oldblobs[path] not in moved]
+    newneeded = [newblobs[path] for path in changed + added if newblobs[path] not in moved]
+    contents = read_git_blobs(repository, oldneeded + newneeded)
+    return snapshot_delta(changed, added, deleted,
+                          lambda path: contents[oldblobs[path]],
+                          lambda path: contents[newblobs[path]],
+                          lambda path: oldblobs[path],
+                          lambda path: newblobs[path])
+
+
+def write_delta_report(entries, total, filehandle=None):
+    """
+    Writes the LOC delta of each file and the total delta.
+
+    Args: entries (list): delta of each file, see snapshot_delta. total (dict): total delta. filehandle (TextIOWrapper,
+    optional): File handle of the file where the output will be written. Defaults to None.
+    """
+    for entry in entries:
+        print("=" * 26, file=filehandle)
+        if entry["Status"] == "moved":
+            print(f"File: {entry['Path']} (moved from {entry['From']})", file=filehandle)
+        else:
+            print(f"File: {entry['Path']} ({entry['Status']})", file=filehandle)
+        print(f"Added LOC: {entry['Added']}", file=filehandle)
+        print(f"Modified LOC: {entry['Modified']}", file=filehandle)
+        print(f"Deleted LOC: {entry['Deleted']}", file=filehandle)
         print("=" * 26, file=filehandle)
+    print("*" * 26, file=filehandle)
+    print(f"Total Added LOC: {total['Added']}", file=filehandle)
+    print(f"Total Modified LOC: {total['Modified']}", file=filehandle)
+    print(f"Total Deleted LOC: {total['Deleted']}", file=filehandle)
+    print(f"Total Added + Modified LOC: {total['Added'] + total['Modified']}", file=filehandle)
+    print("*" * 26, file=filehandle)
 
 
 # driver code
 if __name__ == "__main__":
-    homedir = input("Enter the home path to search for python files: ")
-    with open(os.path.join(homedir, "loc.txt"), "w") as handle:
-        traversefolder(homedir, handle)
-    handle.close()
+    parser = argparse.ArgumentParser(description="Counts the lines of code of the python files under a folder")
+    parser.add_argument("homepath", nargs="?", help="home path to search for python files (prompted when omitted)")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes, 0 for the number of CPUs")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed for the analysis of each file")
+    parser.add_argument("--cache", default=None, help="cache file of the results of unchanged files")
+    parser.add_argument("--format", choices=["text", "jsonl", "csv", "sqlite"], default="text",
+                        help="format of the report")
+    parser.add_argument("--output", default=None,
+                        help="path of the report, defaults to loc.txt, loc.jsonl, loc.csv or loc.db in the home path")
+    parser.add_argument("--compare", default=None, metavar="OLDPATH",
+                        help="writes the LOC delta from the tree at OLDPATH to the home path to loc-delta.txt instead")
+    parser.add_argument("--revisions", nargs=2, default=None, metavar=("OLD", "NEW"),
+                        help="writes the LOC delta between two revisions of the git repository at the home path")
+    arguments = parser.parse_args()
+
+    homedir = arguments.homepath
+    if homedir is None:
+        homedir = input("Enter the home path to search for python files: ")
+    skipped = []
+    if arguments.compare is not None or arguments.revisions is not None:
+        if arguments.revisions is not None:
+            fileentries, totaldelta = git_delta(homedir, *arguments.revisions)
+        else:
+            fileentries, totaldelta = tree_delta(arguments.compare, homedir)
+        with open(arguments.output or os.path.join(homedir, "loc-delta.txt"), "w") as handle:
+            write_delta_report(fileentries, totaldelta, handle)
+    elif arguments.format == "text":
+        with open(arguments.output or os.path.join(homedir, "loc.txt"), "w") as handle:
+            skipped = traversefolder(homedir, handle, arguments.workers or None, arguments.timeout,
+                                     arguments.cache)
+        handle.close()
+    else:
+        reportnames = {"jsonl": "loc.jsonl", "csv": "loc.csv", "sqlite": "loc.db"}
+        report = arguments.output or os.path.join(homedir, reportnames[arguments.format])
+        reportsink = open_sink(arguments.format, report, os.path.abspath(homedir))
+        skipped = traversefolder(homedir, workers=arguments.workers or None, timeout=arguments.timeout,
+                                 cachefile=arguments.cache, sink=reportsink)
+    for skippedfile in skipped:
+        print(f"Timed out: {skippedfile}", file=sys.stderr)
@@ -14,6 +14,25 @@
 # importing csv module for reading a csv file
 import csv
 
+# importing array, collections, math and operator for the regression engine
+import array
+import collections
+import math
+import operator
+
+# importing argparse, json and os for the streaming regression and its saved state
+import argparse
+import json
+import os
+
+# importing functools, multiprocessing and sys for the batch PROBE estimates
+import functools
+import multiprocessing
+import sys
+
+# importing struct for the binary cache of the csv files
+import struct
+
 
 def readcsvfile(filepath):
     """
@@ -32,174 +51,739 @@ def readcsvfile(filepath):
     :return: nested list containing each line of the csv file
     """
 
-    csvreader = csv.reader(open(filepath, "r"))
-    lines = []
-    for line in csvreader:
-        lines.append(line)
+    with open(filepath, "r", newline="") as filehandle:
+        lines = list(csv.reader(filehandle))
 
     return lines
 
 
-def statement1(lines):
+# names of the columns of the csv file, as printed with the equations
+COLUMN_NAMES = ("program number",
+                "estimated proxy size",
+                "planned LOC (added+modified)",
+                "actual LOC (added+modified)",
+                "actual time taken")
+
+# (x, y) columns of the four requirements
+REQUIREMENT_PAIRS = ((1, 3), (1, 4), (2, 3), (2, 4))
+
+# result of the regression of a y column on an x column: y = b0 + b1 * x, with the
+# correlation coefficient r, its square and the number of rows n
+RegressionResult = collections.namedtuple("RegressionResult", ["x", "y", "b0", "b1", "r", "r2", "n"])
+
+
+def column_name(column):
+    """
+    Returns the name of a column of the csv file.
+
+    :param column: index of the column
+    :return: name of the column
     """
-    Here, the x value is the estimated proxy size and the y value is the actual LOC
+
+    return COLUMN_NAMES[column] if column < len(COLUMN_NAMES) else f"column {column}"
+
+
+def load_columns(lines):
+    """
+    Parses each field of the csv file once, and returns the columns as arrays of floats.
 
     :param lines: nested list containing each line of the csv file
-    :return: None
+    :return: list of arrays, one for each column
+    """
+
+    if not lines:
+        return []
+    return [array.array("d", map(float, column)) for column in zip(*lines)]
+
+
+# expected columns of a PSP log: name, typecode of its array and the type each field is parsed to
+PSP_SCHEMA = (("program number", "q", int),
+              ("estimated proxy size", "d", float),
+              ("planned LOC (added+modified)", "q", int),
+              ("actual LOC (added+modified)", "q", int),
+              ("actual development hours", "d", float))
+
+# header of the binary cache of a PSP log: magic, version, byte order, number of columns,
+# size and mtime of the csv file it was built from, and number of rows
+CACHE_HEADER = struct.Struct("<4sHcBQqQ")
+CACHE_MAGIC = b"PSPC"
+CACHE_VERSION = 1
+
+
+class PspLogError(ValueError):
+    """
+    Raised when a csv file does not follow the PSP schema. The errors attribute holds the
+    (line number, message) of every malformed row.
     """
 
-    n = 10
+    def __init__(self, filepath, errors):
+        self.filepath = filepath
+        self.errors = errors
+        shown = "; ".join(f"line {line}: {message}" for line, message in errors[:10])
+        more = f" and {len(errors) - 10} more" if len(errors) > 10 else ""
+        super().__init__(f"{filepath}: {len(errors)} malformed rows: {shown}{more}")
 
-    xavg = 0.0
-    yavg = 0.0
 
-    b1 = 0.0
-    b0 = 0.0
+def is_number(field):
+    """
+    Checks whether a field of the csv file is a number.
 
-    numeratorsum = 0
-    denominatorsum = 0
+    :param field: field of the csv file
+    :return: True if the field parses as a float
+    """
 
-    for line in lines:
-        estimatedproxy = float(line[1])
-        actualloc = float(line[3])
+    try:
+        float(field)
+    except ValueError:
+        return False
+    return True
 
-        xavg += estimatedproxy
-        yavg += actualloc
 
-        numeratorsum += (estimatedproxy * actualloc)
-        denominatorsum += (estimatedproxy * estimatedproxy)
+def parse_psp_row(row):
+    """
+    Parses the fields of a row of a PSP log, validating them against the PSP schema.
 
-    xavg /= 10
-    yavg /= 10
+    :param row: fields of the row, as strings
+    :return: list of the parsed values, in the order of the schema
+    """
 
-    b1 = (numeratorsum - (n * xavg * yavg)) / (denominatorsum - (n * xavg * xavg))
-    b0 = yavg - (b1 * xavg)
+    if len(row) != len(PSP_SCHEMA):
+        raise ValueError(f"expected {len(PSP_SCHEMA)} fields, got {len(row)}")
+    values = []
+    for field, (name, typecode, parse) in zip(row, PSP_SCHEMA):
+        try:
+            value = parse(field)
+        except ValueError:
+            raise ValueError(f"{name} is not a valid {parse.__name__}: {field!r}") from None
+        # the values have to fit the typed arrays, and nan or inf would spoil every regression
+        if typecode == "q" and not -(1 << 63) <= value < (1 << 63):
+            raise ValueError(f"{name} is out of the 64-bit range: {field!r}")
+        if typecode == "d" and not math.isfinite(value):
+            raise ValueError(f"{name} is not a finite number: {field!r}")
+        values.append(value)
+    return values
+
+
+def parse_psp_log(filepath):
+    """
+    Reads a csv file, validates each row against the PSP schema and parses each column once
+    into a typed array. Blank lines are skipped, and so is a first row without any number,
+    which is taken for a header.
 
-    print("• X: estimated proxy size; Y: actual LOC (added+modified)")
-    print(f"y = {round(b0, 3)} + {round(b1, 3)}x\n")
+    :param filepath: path of csv file
+    :return: list of arrays, one for each column of the schema
+    """
 
+    columns = [array.array(typecode) for name, typecode, parse in PSP_SCHEMA]
+    errors = []
+    firstrow = True
+    with open(filepath, "r", newline="") as filehandle:
+        csvreader = csv.reader(filehandle)
+        for row in csvreader:
+            if not any(field.strip() for field in row):
+                continue
+            if firstrow:
+                firstrow = False
+                if not any(is_number(field) for field in row):
+                    continue
+            try:
+                values = parse_psp_row(row)
+            except ValueError as error:
+                errors.append((csvreader.line_num, str(error)))
+                continue
+            for column, value in zip(columns, values):
+                column.append(value)
+    if errors:
+        raise PspLogError(filepath, errors)
+    return columns
+
+
+def cache_path(filepath):
+    """
+    Returns the path of the binary cache of a csv file, next to it.
 
-def statement2(lines):
+    :param filepath: path of csv file
+    :return: path of the cache
     """
-    Here, the x value is the estimated proxy size and the y value is the actual time taken.
 
-    :param lines: nested list containing each line of the csv file
+    return filepath + ".cache"
+
+
+def read_psp_cache(filepath, stat):
+    """
+    Reads the binary cache of a csv file if it was built from the current contents of the file.
+
+    :param filepath: path of csv file
+    :param stat: os.stat of the csv file
+    :return: list of arrays, one for each column of the schema, or None if there is no valid cache
+    """
+
+    try:
+        with open(cache_path(filepath), "rb") as filehandle:
+            header = filehandle.read(CACHE_HEADER.size)
+            if len(header) != CACHE_HEADER.size:
+                return None
+            magic, version, byteorder, ncolumns, size, mtime, nrows = CACHE_HEADER.unpack(header)
+            if (magic != CACHE_MAGIC or version != CACHE_VERSION or byteorder != sys.byteorder[0].encode()
+                    or ncolumns != len(PSP_SCHEMA) or size != stat.st_size or mtime != stat.st_mtime_ns):
+                return None
+            columns = []
+            for name, typecode, parse in PSP_SCHEMA:
+                column = array.array(typecode)
+                column.fromfile(filehandle, nrows)
+                columns.append(column)
+    except (OSError, EOFError):
+        return None
+    return columns
+
+
+def write_psp_cache(filepath, stat, columns):
+    """
+    Writes the binary cache of a csv file to a temporary file and moves it into place. A cache
+    which cannot be written (such as in a read-only folder) is skipped.
+
+    :param filepath: path of csv file
+    :param stat: os.stat of the csv file, taken before it was parsed
+    :param columns: arrays of the columns
     :return: None
     """
 
-    n = 10
+    temporaryfile = cache_path(filepath) + ".tmp"
+    try:
+        with open(temporaryfile, "wb") as filehandle:
+            filehandle.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, sys.byteorder[0].encode(), len(columns),
+                                               stat.st_size, stat.st_mtime_ns, len(columns[0])))
+            for column in columns:
+                column.tofile(filehandle)
+        os.replace(temporaryfile, cache_path(filepath))
+    except OSError:
+        pass
 
-    xavg = 0.0
-    yavg = 0.0
 
-    b1 = 0.0
-    b0 = 0.0
+def load_psp_log(filepath, use_cache=True):
+    """
+    Loads the columns of a PSP log as typed arrays, from its binary cache while the size and
+    mtime of the csv file are those the cache was built from, or else by parsing the csv file
+    (see parse_psp_log) and writing the cache for the next load.
 
-    numeratorsum = 0
-    denominatorsum = 0
+    :param filepath: path of csv file
+    :param use_cache: reads and writes the binary cache next to the csv file
+    :return: list of arrays, one for each column of the schema
+    """
 
-    for line in lines:
-        estimatedproxy = float(line[1])
-        actualtimetaken = float(line[4])
+    if not use_cache:
+        return parse_psp_log(filepath)
+    stat = os.stat(filepath)
+    columns = read_psp_cache(filepath, stat)
+    if columns is None:
+        columns = parse_psp_log(filepath)
+        write_psp_cache(filepath, stat, columns)
+    return columns
 
-        xavg += estimatedproxy
-        yavg += actualtimetaken
 
-        numeratorsum += (estimatedproxy * actualtimetaken)
-        denominatorsum += (estimatedproxy * estimatedproxy)
+def regress_pairs(columns, pairs=REQUIREMENT_PAIRS):
+    """
+    Fits the linear regression y = b0 + b1 * x for every (x, y) pair of columns.
 
-    xavg /= 10
-    yavg /= 10
+    The sum and the sum of squares of each column used by a pair, and the sum of the products
+    of each pair, are computed once, so a column shared by several pairs is only summed once
+    and each fit is then a constant number of operations. The number of rows n is taken from
+    the data.
 
-    b1 = (numeratorsum - (n * xavg * yavg)) / (denominatorsum - (n * xavg * xavg))
-    b0 = yavg - (b1 * xavg)
+    :param columns: arrays of the columns, as returned by load_columns or load_psp_log
+    :param pairs: (x, y) indices of the columns to regress
+    :return: list of RegressionResult, in the order of the pairs
+    """
 
-    print("• X: estimated proxy size; Y: actual time taken")
-    print(f"y = {round(b0, 3)} + {round(b1, 3)}x\n")
+    n = len(columns[0]) if columns else 0
+    if n < 2:
+        raise ValueError(f"At least two rows are needed for a regression, got {n}")
+
+    used = sorted(set(column for pair in pairs for column in pair))
+    sums = {column: sum(columns[column]) for column in used}
+    squares = {column: sum(map(operator.mul, columns[column], columns[column])) for column in used}
+    products = {}
+    for pair in pairs:
+        if pair not in products:
+            products[pair] = sum(map(operator.mul, columns[pair[0]], columns[pair[1]]))
+
+    results = []
+    for x, y in pairs:
+        xavg = sums[x] / n
+        yavg = sums[y] / n
+        sxy = products[(x, y)] - (n * xavg * yavg)
+        sxx = squares[x] - (n * xavg * xavg)
+        syy = squares[y] - (n * yavg * yavg)
+        if sxx <= 0:
+            raise ValueError(f"The column {column_name(x)} has no variance")
+        b1 = sxy / sxx
+        b0 = yavg - (b1 * xavg)
+        r = sxy / math.sqrt(sxx * syy) if syy > 0 else 0.0
+        results.append(RegressionResult(x, y, b0, b1, r, r * r, n))
+    return results
+
+
+class OnlineRegression:
+    """
+    Constant-memory regression over a stream of rows, for every (x, y) pair of columns.
 
+    The mean and the sum of squared deviations of each column, and the co-moment of each pair,
+    are updated row by row with Welford's method, which stays accurate where the sums of
+    squares of the batch formulas would lose their precision. The state can be saved along
+    with the offset of the csv file it has read up to, so rows appended to the file later
+    are read without reading the earlier ones again.
+    """
 
-def statement3(lines):
+    def __init__(self, pairs=REQUIREMENT_PAIRS):
+        """
+        :param pairs: (x, y) indices of the columns to regress
+        """
+
+        self.pairs = [tuple(pair) for pair in pairs]
+        self.columns = sorted(set(column for pair in self.pairs for column in pair))
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the moments and the position in the csv file.
+
+        :return: None
+        """
+
+        self.n = 0
+        self.means = {column: 0.0 for column in self.columns}
+        self.squares = {column: 0.0 for column in self.columns}
+        self.comoments = {pair: 0.0 for pair in self.pairs}
+        self.source = None
+        self.offset = 0
+        self.lastline = ""
+        self.lines = 0
+        self.rows = 0
+
+    def add(self, row):
+        """
+        Adds a row to the running moments.
+
+        :param row: fields of the row, as numbers or strings
+        :return: None
+        """
+
+        # the fields are parsed before any moment changes, so a bad field leaves the state as it was
+        values = {column: float(row[column]) for column in self.columns}
+        self.n += 1
+        deviations = {}
+        for column, value in values.items():
+            deviation = value - self.means[column]
+            self.means[column] += deviation / self.n
+            deviations[column] = deviation
+            self.squares[column] += deviation * (value - self.means[column])
+        for x, y in self.pairs:
+            self.comoments[(x, y)] += deviations[x] * (values[y] - self.means[y])
+
+    def results(self):
+        """
+        Computes the regression of each pair from the running moments.
+
+        :return: list of RegressionResult, in the order of the pairs
+        """
+
+        if self.n < 2:
+            raise ValueError(f"At least two rows are needed for a regression, got {self.n}")
+        results = []
+        for x, y in self.pairs:
+            if self.squares[x] <= 0:
+                raise ValueError(f"The column {column_name(x)} has no variance")
+            b1 = self.comoments[(x, y)] / self.squares[x]
+            b0 = self.means[y] - (b1 * self.means[x])
+            r = self.comoments[(x, y)] / math.sqrt(self.squares[x] * self.squares[y]) if self.squares[y] > 0 else 0.0
+            results.append(RegressionResult(x, y, b0, b1, r, r * r, self.n))
+        return results
+
+    def update_from_file(self, filepath):
+        """
+        Adds the rows of the csv file which were appended since the last update, reading
+        the file from the saved offset. A last line without its newline is left for the
+        next update, as it may still be being written. If the file was truncated or
+        rewritten, the moments are reset and the file is read from the start.
+
+        The rows are validated as parse_psp_log does: blank lines are skipped, and so is a
+        first row without any number. If any row is malformed, none of the appended rows
+        are added, and PspLogError reports each malformed row by its line in the file.
+
+        :param filepath: path of csv file
+        :return: number of rows added
+        """
+
+        with open(filepath, "rb") as filehandle:
+            if self.source != os.path.abspath(filepath) or not self.continues(filehandle):
+                self.reset()
+                self.source = os.path.abspath(filepath)
+            filehandle.seek(self.offset)
+            previous = self.state()
+            added = 0
+            errors = []
+
+            def complete_lines():
+                for rawline in filehandle:
+                    if not rawline.endswith(b"\n"):
+                        break
+                    self.offset += len(rawline)
+                    line = rawline.decode("utf-8")
+                    self.lastline = line
+                    yield line
+
+            csvreader = csv.reader(complete_lines())
+            for row in csvreader:
+                if not any(field.strip() for field in row):
+                    continue
+                self.rows += 1
+                if self.rows == 1 and not any(is_number(field) for field in row):
+                    continue
+                try:
+                    values = parse_psp_row(row)
+                except ValueError as error:
+                    errors.append((previous["lines"] + csvreader.line_num, str(error)))
+                    continue
+                if not errors:
+                    self.add(values)
+                    added += 1
+            self.lines = previous["lines"] + csvreader.line_num
+        if errors:
+            self.restore(previous)
+            raise PspLogError(filepath, errors)
+        return added
+
+    def continues(self, filehandle):
+        """
+        Checks that the file still holds the line read last, just before the saved offset.
+
+        :param filehandle: csv file opened in binary mode
+        :return: True if the rows after the offset are appended to the ones already read
+        """
+
+        lastline = self.lastline.encode("utf-8")
+        if self.offset < len(lastline):
+            return False
+        filehandle.seek(self.offset - len(lastline))
+        return filehandle.read(len(lastline)) == lastline
+
+    def state(self):
+        """
+        Returns the moments and the position in the csv file, in a form json can write.
+
+        :return: dict of the state
+        """
+
+        return {"pairs": self.pairs,
+                "n": self.n,
+                "means": list(self.means.items()),
+                "squares": list(self.squares.items()),
+                "comoments": [[x, y, value] for (x, y), value in self.comoments.items()],
+                "source": self.source,
+                "offset": self.offset,
+                "lastline": self.lastline,
+                "lines": self.lines,
+                "rows": self.rows}
+
+    def restore(self, state):
+        """
+        Sets the moments and the position in the csv file from a state returned by state.
+
+        :param state: dict of the state, for the same pairs
+        :return: None
+        """
+
+        self.n = state["n"]
+        self.means = {column: value for column, value in state["means"]}
+        self.squares = {column: value for column, value in state["squares"]}
+        self.comoments = {(x, y): value for x, y, value in state["comoments"]}
+        self.source = state["source"]
+        self.offset = state["offset"]
+        self.lastline = state["lastline"]
+        # a state saved without the counts of lines and rows numbers the lines from where it resumes
+        self.lines = state.get("lines", 0)
+        self.rows = state.get("rows", state["n"])
+
+    def save(self, statefile):
+        """
+        Writes the state to a temporary file and moves it into place.
+
+        :param statefile: path of the state file
+        :return: None
+        """
+
+        with open(statefile + ".tmp", "w") as filehandle:
+            json.dump(self.state(), filehandle)
+        os.replace(statefile + ".tmp", statefile)
+
+    @classmethod
+    def load(cls, statefile):
+        """
+        Reads a state written by save.
+
+        :param statefile: path of the state file
+        :return: OnlineRegression
+        """
+
+        with open(statefile, "r") as filehandle:
+            state = json.load(filehandle)
+        regression = cls(state["pairs"])
+        regression.restore(state)
+        return regression
+
+
+def stream_regression(filepath, statefile, pairs=REQUIREMENT_PAIRS):
     """
-    Here, the x value is the planned LOC and the y value is the actual LOC
+    Updates the saved online regression of a csv file with its appended rows, and saves it again.
+    The state is started over when the state file is missing or was kept for other pairs.
 
-    :param lines: nested list containing each line of the csv file
-    :return: None
+    :param filepath: path of csv file
+    :param statefile: path of the state file
+    :param pairs: (x, y) indices of the columns to regress
+    :return: list of RegressionResult, in the order of the pairs
+    """
+
+    regression = None
+    if os.path.exists(statefile):
+        regression = OnlineRegression.load(statefile)
+        if regression.pairs != [tuple(pair) for pair in pairs]:
+            regression = None
+    if regression is None:
+        regression = OnlineRegression(pairs)
+    regression.update_from_file(filepath)
+    regression.save(statefile)
+    return regression.results()
+
+
+def incomplete_beta(a, b, x):
     """
+    Computes the regularized incomplete beta function I_x(a, b) with its continued fraction,
+    evaluated by the modified Lentz method.
 
-    n = 10
+    :param a: first parameter, greater than 0
+    :param b: second parameter, greater than 0
+    :param x: point between 0 and 1
+    :return: value of I_x(a, b)
+    """
 
-    xavg = 0.0
-    yavg = 0.0
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    # the continued fraction converges quickly below the mean of the distribution only
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - incomplete_beta(b, a, 1.0 - x)
+
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x))
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1.0) < 1e-15:
+            break
+    return front * fraction / a
+
+
+def t_cdf(t, df):
+    """
+    Computes the cumulative distribution function of Student's t distribution.
 
-    b1 = 0.0
-    b0 = 0.0
+    :param t: value of the t statistic
+    :param df: degrees of freedom
+    :return: probability of a value lower than t
+    """
 
-    numeratorsum = 0
-    denominatorsum = 0
+    tail = 0.5 * incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+    return 1.0 - tail if t > 0 else tail
 
-    for line in lines:
-        plannedloc = float(line[2])
-        actualloc = float(line[3])
 
-        xavg += plannedloc
-        yavg += actualloc
+def t_quantile(p, df):
+    """
+    Finds the value of Student's t distribution below which the probability is p, by bisection.
+
+    :param p: probability between 0 and 1
+    :param df: degrees of freedom
+    :return: value of t
+    """
 
-        numeratorsum += (plannedloc * actualloc)
-        denominatorsum += (plannedloc * plannedloc)
+    if p < 0.5:
+        return -t_quantile(1.0 - p, df)
+    low, high = 0.0, 1.0
+    while t_cdf(high, df) < p:
+        low, high = high, high * 2
+    for _ in range(200):
+        middle = (low + high) / 2
+        if t_cdf(middle, df) < p:
+            low = middle
+        else:
+            high = middle
+        if high - low < 1e-12 * high:
+            break
+    return (low + high) / 2
 
-    xavg /= 10
-    yavg /= 10
 
-    b1 = (numeratorsum - (n * xavg * yavg)) / (denominatorsum - (n * xavg * xavg))
-    b0 = yavg - (b1 * xavg)
+# (x, y) columns of the PROBE estimates from the estimated proxy size: actual LOC and actual time taken
+PROBE_PAIRS = ((1, 3), (1, 4))
 
-    print("• X: planned LOC (added+modified); Y: actual LOC (added+modified)")
-    print(f"y = {round(b0, 3)} + {round(b1, 3)}x\n")
+# estimate of a y column from a new x value with the regression of the pair, the two-tailed
+# significance of its correlation, and the half widths of its 70% and 90% prediction intervals
+ProbeResult = collections.namedtuple("ProbeResult", ["x", "y", "b0", "b1", "r", "r2", "n", "significance",
+                                                     "estimate", "range70", "range90"])
 
 
-def statement4(lines):
+def probe_estimates(columns, proxysize, pairs=PROBE_PAIRS):
+    """
+    Estimates the y column of each pair for a new x value as the PROBE method does: the
+    regression gives the estimate, the t test of the correlation its significance, and
+    the t distribution with n - 2 degrees of freedom its 70% and 90% prediction intervals.
+
+    :param columns: arrays of the columns, as returned by load_columns or load_psp_log
+    :param proxysize: new x value, such as the estimated proxy size of the next program
+    :param pairs: (x, y) indices of the columns to regress
+    :return: list of ProbeResult, in the order of the pairs
     """
-    Here, the x value is the planned LOC and the y value is the actual time taken
 
-    :param lines: nested list containing each line of the csv file
-    :return: None
+    n = len(columns[0]) if columns else 0
+    if n < 3:
+        raise ValueError(f"At least three rows are needed for prediction intervals, got {n}")
+    t70 = t_quantile(0.85, n - 2)
+    t90 = t_quantile(0.95, n - 2)
+
+    estimates = []
+    for result in regress_pairs(columns, pairs):
+        xs = columns[result.x]
+        xavg = sum(xs) / n
+        sxx = sum((value - xavg) ** 2 for value in xs)
+        residuals = sum((y - result.b0 - result.b1 * x) ** 2 for x, y in zip(xs, columns[result.y]))
+        sigma = math.sqrt(residuals / (n - 2))
+        spread = sigma * math.sqrt(1 + 1 / n + (proxysize - xavg) ** 2 / sxx)
+
+        if result.r2 >= 1.0:
+            significance = 0.0
+        else:
+            statistic = abs(result.r) * math.sqrt(n - 2) / math.sqrt(1 - result.r2)
+            significance = 2 * (1 - t_cdf(statistic, n - 2))
+        estimates.append(ProbeResult(*result, significance, result.b0 + result.b1 * proxysize,
+                                     t70 * spread, t90 * spread))
+    return estimates
+
+
+def find_csv_files(homepath):
     """
+    Traverses each folder and sub-folders recursively and finds out the csv files.
 
-    n = 10
+    :param homepath: home path where the csv files are to be searched recursively
+    :return: sorted list of the paths of the csv files
+    """
 
-    xavg = 0.0
-    yavg = 0.0
+    csvfiles = []
+    for root, folders, files in os.walk(homepath):
+        for file in files:
+            if file.endswith(".csv"):
+                csvfiles.append(os.path.join(root, file))
+    return sorted(csvfiles)
 
-    b1 = 0.0
-    b0 = 0.0
 
-    numeratorsum = 0
-    denominatorsum = 0
+def probe_file(filepath, proxysize, pairs=PROBE_PAIRS):
+    """
+    Computes the PROBE estimates of one csv file, catching the errors of a bad file so a
+    batch carries on with the other files. Run by the worker processes of batch_probe.
 
-    for line in lines:
-        plannedloc = float(line[2])
-        actualtimetaken = float(line[3])
+    :param filepath: path of csv file
+    :param proxysize: new x value
+    :param pairs: (x, y) indices of the columns to regress
+    :return: path of the file, list of ProbeResult (empty for a bad file) and the error or None
+    """
 
-        xavg += plannedloc
-        yavg += actualtimetaken
+    try:
+        return filepath, probe_estimates(load_psp_log(filepath), proxysize, pairs), None
+    except (OSError, ValueError, IndexError, ZeroDivisionError, UnicodeDecodeError, csv.Error) as error:
+        return filepath, [], f"{type(error).__name__}: {error}"
 
-        numeratorsum += (plannedloc * actualtimetaken)
-        denominatorsum += (plannedloc * plannedloc)
 
-    xavg /= 10
-    yavg /= 10
+def batch_probe(homepath, proxysize, outputfile="probe.csv", workers=None, pairs=PROBE_PAIRS):
+    """
+    Computes the PROBE estimates of every csv file under a folder across a process pool and
+    writes them to one consolidated csv table, one row per file and pair, in the order of
+    the paths. A bad file gets one row with its error instead of its estimates.
+
+    :param homepath: home path where the csv files are to be searched recursively
+    :param proxysize: new x value
+    :param outputfile: path of the consolidated table
+    :param workers: number of worker processes, None for the number of CPUs
+    :param pairs: (x, y) indices of the columns to regress
+    :return: number of files estimated and list of (path, error) of the bad files
+    """
 
-    b1 = (numeratorsum - (n * xavg * yavg)) / (denominatorsum - (n * xavg * xavg))
-    b0 = yavg - (b1 * xavg)
+    csvfiles = find_csv_files(homepath)
+    badfiles = []
+    workers = workers or os.cpu_count() or 1
+    # large chunks keep the pool busy without a round trip per file, and imap keeps the order
+    chunksize = max(1, len(csvfiles) // (workers * 8))
+    with open(outputfile, "w", newline="") as filehandle, multiprocessing.Pool(workers) as pool:
+        writer = csv.writer(filehandle)
+        writer.writerow(["file", "x", "y", "n", "b0", "b1", "r", "r2", "significance", "estimate",
+                         "lpi70", "upi70", "lpi90", "upi90", "error"])
+        for filepath, estimates, error in pool.imap(functools.partial(probe_file, proxysize=proxysize, pairs=pairs),
+                                                    csvfiles, chunksize):
+            if error is not None:
+                badfiles.append((filepath, error))
+                writer.writerow([filepath] + [""] * 13 + [error])
+                continue
+            for estimate in estimates:
+                writer.writerow([filepath, column_name(estimate.x), column_name(estimate.y), estimate.n,
+                                 estimate.b0, estimate.b1, estimate.r, estimate.r2, estimate.significance,
+                                 estimate.estimate, estimate.estimate - estimate.range70,
+                                 estimate.estimate + estimate.range70, estimate.estimate - estimate.range90,
+                                 estimate.estimate + estimate.range90, ""])
+    return len(csvfiles) - len(badfiles), badfiles
+
+
+def print_regression(result):
+    """
+    Prints the columns of a regression and its equation.
+
+    :param result: RegressionResult
+    :return: None
+    """
 
-    print("• X: planned LOC (added+modified); Y: actual time taken")
-    print(f"y = {round(b0, 3)} + {round(b1, 3)}x\n")
+    print(f"• X: {column_name(result.x)}; Y: {column_name(result.y)}")
+    print(f"y = {round(result.b0, 3)} + {round(result.b1, 3)}x\n")
 
 
 # driver code
 if __name__ == "__main__":
-    data = readcsvfile("loc.csv")
-    statement1(data)
-    statement2(data)
-    statement3(data)
-    statement4(data)
+    parser = argparse.ArgumentParser(description="Prints the linear regressions of a PSP log")
+    parser.add_argument("csvfile", nargs="?", default="loc.csv", help="path of the csv file")
+    parser.add_argument("--state", default=None,
+                        help="state file of a streaming regression, which only reads the rows appended since")
+    parser.add_argument("--batch", default=None, metavar="HOMEPATH",
+                        help="writes the PROBE estimates of every csv file under HOMEPATH to one table instead")
+    parser.add_argument("--proxy-size", type=float, default=None, help="estimated proxy size of the new program")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes of the batch")
+    parser.add_argument("--output", default="probe.csv", help="path of the table of the batch")
+    arguments = parser.parse_args()
+
+    if arguments.batch is not None:
+        if arguments.proxy_size is None:
+            parser.error("--batch needs --proxy-size")
+        estimated, failures = batch_probe(arguments.batch, arguments.proxy_size, arguments.output, arguments.workers)
+        print(f"Estimated {estimated} files into {arguments.output}")
+        for failedfile, reason in failures:
+            print(f"Bad file: {failedfile} ({reason})", file=sys.stderr)
+    else:
+        if arguments.state is not None:
+            regressions = stream_regression(arguments.csvfile, arguments.state)
+        else:
+            regressions = regress_pairs(load_psp_log(arguments.csvfile))
+        for regression in regressions:
+            print_regression(regression)
@@ -0,0 +1,166 @@
+"""This module runs the word frequency analysis of Ex1 and the line counting of Ex2 over
+one home directory with a single traversal of it.
+
+The files are found by the os.scandir walk of Ex1, and each one is handed to its stage
+as soon as its directory is scanned: the text files to the word counting, which writes
+the words and their histogram, and the python files to the line counting, which writes
+the report of the lines of code. Both stages run in threads of their own while the walk
+goes on. The options are taken from the command line, so the pipeline can be scheduled.
+
+Created on: 18 Oct 2026
+
+"""
+
+# Importing argparse, concurrent.futures, os, queue and sys for running the stages from the command line
+import argparse
+import concurrent.futures
+import os
+import queue
+import sys
+
+# Importing the word frequency analysis of Ex1 and the line counting of Ex2
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ex1"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ex2"))
+import main  # noqa: E402
+import codecounting  # noqa: E402
+
+# Name of the report of the lines of code in each of its formats
+LOC_REPORTS = {"text": "loc.txt", "jsonl": "loc.jsonl", "csv": "loc.csv", "sqlite": "loc.db"}
+
+
+def drain(files: queue.Queue):
+    """Generates the files put into a queue by the walk, until the walk puts None.
+
+    Args:
+        files (Queue): queue of the files of a stage
+
+    Yields:
+        str: file with its absolute path
+    """
+    while True:
+        file = files.get()
+        if file is None:
+            return
+        yield file
+
+
+def word_stage(textfiles, words_file: str, histogram_file: str, words_mode: str = "batched",
+               order: str = "insertion", top_n: int = None) -> int:
+    """Counts the words of the text files as they come, and writes the words and their histogram.
+
+    Args:
+        textfiles (iterable): text files with their absolute path
+        words_file (str): name of the words file along with its path
+        histogram_file (str): name of the histogram file along with its path
+        words_mode (str, optional): output mode of the words, see main.open_words_file. Defaults to "batched".
+        order (str, optional): order of the histogram, see main.write_word_histogram. Defaults to "insertion".
+        top_n (int, optional): only writes the top_n most frequent words. Defaults to None (all the words).
+
+    Returns:
+        int: number of distinct words
+    """
+    frequency = main.get_words_and_frequency_write(textfiles, words_file, words_mode=words_mode)
+    main.write_word_histogram(frequency, histogram_file, order, top_n)
+    return len(frequency)
+
+
+def loc_stage(pythonfiles, home_path: str, report_file: str, report_format: str = "text", workers: int = 1,
+              timeout: float = None, cache_file: str = None) -> list:
+    """Counts the lines of code of the python files as they come, and writes the report.
+
+    Args:
+        pythonfiles (iterable): python files with their absolute path
+        home_path (str): home directory of the files
+        report_file (str): name of the report along with its path
+        report_format (str, optional): "text", "jsonl", "csv" or "sqlite". Defaults to "text".
+        workers (int, optional): number of worker processes, None for the number of CPUs. Defaults to 1.
+        timeout (float, optional): seconds allowed for the analysis of each file. Defaults to None.
+        cache_file (str, optional): cache file of the results of unchanged files. Defaults to None.
+
+    Returns:
+        list: python files which timed out
+    """
+    if report_format == "text":
+        with open(report_file, "w") as handle:
+            return codecounting.report_python_files(pythonfiles, home_path, handle, workers, timeout, cache_file)
+    sink = codecounting.open_sink(report_format, report_file, os.path.abspath(home_path))
+    return codecounting.report_python_files(pythonfiles, home_path, workers=workers, timeout=timeout,
+                                            cachefile=cache_file, sink=sink)
+
+
+def run_pipeline(home_path: str, output_dir: str = ".", words_mode: str = "batched", order: str = "insertion",
+                 top_n: int = None, report_format: str = "text", workers: int = 1, timeout: float = None,
+                 cache_file: str = None) -> tuple:
+    """Walks the home directory once, routing the text files to the word stage and the python
+    files to the line counting stage, which run concurrently with the walk and each other.
+
+    The files come in the order of os.walk, so the outputs are the same as those of Ex1/main.py
+    and Ex2/codecounting.py run separately. The output files are left out of the walk when they
+    are inside the home directory.
+
+    Args:
+        home_path (str): home directory to search
+        output_dir (str, optional): directory of the outputs. Defaults to ".".
+        words_mode (str, optional): output mode of the words, see main.open_words_file. Defaults to "batched".
+        order (str, optional): order of the histogram, see main.write_word_histogram. Defaults to "insertion".
+        top_n (int, optional): only writes the top_n most frequent words. Defaults to None (all the words).
+        report_format (str, optional): format of the report of the lines of code. Defaults to "text".
+        workers (int, optional): number of worker processes of the line counting. Defaults to 1.
+        timeout (float, optional): seconds allowed for the analysis of each python file. Defaults to None.
+        cache_file (str, optional): cache file of the results of unchanged python files. Defaults to None.
+
+    Returns:
+        tuple: number of distinct words and the python files which timed out
+    """
+    words_file = os.path.join(output_dir, "words.txt")
+    histogram_file = os.path.join(output_dir, "words-histogram.txt")
+    report_file = os.path.join(output_dir, LOC_REPORTS[report_format])
+    outputs = {os.path.realpath(file) for file in (words_file, histogram_file, report_file)}
+
+    text_queue = queue.Queue()
+    python_queue = queue.Queue()
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        words = executor.submit(word_stage, drain(text_queue), words_file, histogram_file, words_mode, order, top_n)
+        loc = executor.submit(loc_stage, drain(python_queue), home_path, report_file, report_format, workers,
+                              timeout, cache_file)
+        try:
+            for file in main.scan_files(home_path, include=("*.txt", "*.py")):
+                if os.path.realpath(file) in outputs:
+                    continue
+                if file.endswith(".py"):
+                    python_queue.put(file)
+                else:
+                    text_queue.put(file)
+        finally:
+            # the stages finish their files and write their outputs even if the walk failed
+            text_queue.put(None)
+            python_queue.put(None)
+        return words.result(), loc.result()
+
+
+# driver code
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Counts the words of the text files and the lines of code of the "
+                                                 "python files under a home directory, with a single traversal")
+    parser.add_argument("home_path", help="home directory to search")
+    parser.add_argument("--output-dir", default=".", help="directory of the outputs")
+    parser.add_argument("--words-mode", choices=["batched", "none", "gzip", "zstd"], default="batched",
+                        help="output mode of the words")
+    parser.add_argument("--order", choices=["insertion", "count", "alpha"], default="insertion",
+                        help="order of the word histogram")
+    parser.add_argument("--top", type=int, default=None, help="only writes the most frequent words")
+    parser.add_argument("--loc-format", choices=list(LOC_REPORTS), default="text",
+                        help="format of the report of the lines of code")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes, 0 for the number of CPUs")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed for the analysis of each file")
+    parser.add_argument("--cache", default=None, help="cache file of the results of unchanged python files")
+    arguments = parser.parse_args()
+    if not os.path.isdir(arguments.home_path):
+        parser.error(f"{arguments.home_path} is not a directory")
+
+    distinct_words, timed_out = run_pipeline(arguments.home_path, arguments.output_dir, arguments.words_mode,
+                                             arguments.order, arguments.top, arguments.loc_format,
+                                             arguments.workers or None, arguments.timeout, arguments.cache)
+    print(f"{distinct_words} distinct words, {LOC_REPORTS[arguments.loc_format]} written to {arguments.output_dir}")
+    for timed_out_file in timed_out:
+        print(f"Timed out: {timed_out_file}", file=sys.stderr)